@@ -7,8 +7,11 @@ that different communication methods must implement to effectively support
 tockloader.
 """
 
+import contextlib
 import logging
 import os
+import shlex
+import tempfile
 
 from .exceptions import TockLoaderException
 
@@ -337,6 +340,10 @@ class BoardInterface:
         self.no_attribute_table = False  # We assume this is a full tock board.
         self.address_translator = None
 
+        # Files for passing binaries to and from external tools, see
+        # `_get_scratch_file()`.
+        self.scratch_files = []
+
         # Next try to use `KNOWN_BOARDS`.
         self._configure_from_known_boards()
 
@@ -424,6 +431,15 @@ class BoardInterface:
         """
         return
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager around a group of writes. Channels where each
+        operation has a high fixed cost can use this to run the writes made
+        inside the `with` block together. By default writes happen right away.
+        """
+        yield
+
     def read_range(self, address, length):
         """
         Read a specific range of flash.
@@ -480,7 +496,7 @@ class BoardInterface:
             for i in range(0, len(l), n):
                 yield l[i : i + n]
 
-        raw = self.read_range(0x600, 64 * 16)
+        raw = self._read_bootloader_region()[0x200:0x600]
         attributes = [self._decode_attribute(r) for r in chunks(raw, 64)]
 
         # Cache what we get in case this gets called again.
@@ -493,7 +509,8 @@ class BoardInterface:
         Set a single attribute.
         """
         # Remove any cached attributes
-        del self.attributes
+        if hasattr(self, "attributes"):
+            del self.attributes
 
         address = 0x600 + (64 * index)
         self.flash_binary(address, raw)
@@ -517,20 +534,51 @@ class BoardInterface:
         except Exception as e:
             return None
 
+    def _read_bootloader_region(self):
+        """
+        Read the start of flash that holds the bootloader flag (0x400), the
+        bootloader version (0x40E), and the attributes (0x600-0xA00).
+
+        These are all needed while figuring out what board we are talking to,
+        and for channels like JLinkExe or OpenOCD every `read_range()` means
+        starting the external tool again. Reading the region once and caching
+        it lets all of those lookups share a single read.
+        """
+        if not hasattr(self, "bootloader_region"):
+            self.bootloader_region = self.read_range(0x400, 0x600)
+        return self.bootloader_region
+
+    def _invalidate_bootloader_region(self, address, length):
+        """
+        Drop the cached bootloader region and attributes if writing `length`
+        bytes at `address` changes them. Channels that use the cache call this
+        from `flash_binary()`.
+        """
+        if address < 0xA00 and 0x400 < address + length:
+            if hasattr(self, "bootloader_region"):
+                del self.bootloader_region
+            if hasattr(self, "attributes"):
+                del self.attributes
+
     def bootloader_is_present(self):
         """
-        Check for the Tock bootloader. Returns `True` if it is present, `False`
-        if not, and `None` if unsure.
+        Check for the Tock bootloader. Returns `True` if it is present and
+        `False` if not.
+
+        The default implementation looks for the string "TOCKBOOTLOADER" at
+        address 0x400.
         """
-        return None
+        flag = self._read_bootloader_region()[0:14]
+        flag_str = flag.decode("utf-8", "ignore")
+        logging.debug("Read from flags location: {}".format(flag_str))
+        return flag_str == "TOCKBOOTLOADER"
 
     def get_bootloader_version(self):
         """
         Return the version string of the bootloader. Should return a value
         like `0.5.0`, or `None` if it is unknown.
         """
-        address = 0x40E
-        version_raw = self.read_range(address, 8)
+        version_raw = self._read_bootloader_region()[0x0E:0x16]
         try:
             return version_raw.decode("utf-8")
         except:
@@ -593,6 +641,51 @@ class BoardInterface:
             "No terminal mechanism implemented for this host->board communication method."
         )
 
+    def _get_scratch_file(self, index):
+        """
+        Return scratch file number `index` for passing binaries to and from an
+        external tool, creating it if needed. The files are reused for every
+        command rather than making a new temporary file each time. Channels
+        that use them must call `_remove_scratch_files()` when done.
+        """
+        scratch_dir = self._get_temp_dir()
+        while len(self.scratch_files) <= index:
+            # We delete these ourselves, as on Windows other programs cannot
+            # open files that are marked to be deleted on close.
+            self.scratch_files.append(
+                tempfile.NamedTemporaryFile(
+                    mode="w+b", suffix=".bin", dir=scratch_dir, delete=False
+                )
+            )
+        return self.scratch_files[index]
+
+    def _remove_scratch_files(self):
+        """
+        Delete the scratch files. They are kept when debugging.
+        """
+        for scratch_file in self.scratch_files:
+            scratch_file.close()
+            if not self.args.debug:
+                os.remove(scratch_file.name)
+        self.scratch_files = []
+
+    def _format_cmdline(self, args):
+        """
+        Return `args` as a command that can be pasted into a shell, for
+        logging.
+        """
+        return " ".join(shlex.quote(arg) for arg in args)
+
+    def _get_temp_dir(self):
+        """
+        Return the directory for files passed to the programming tools, or
+        `None` to use the default temporary directory. These files never need
+        to reach a disk, so on Linux use `/dev/shm` if we can.
+        """
+        if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+            return "/dev/shm"
+        return None
+
     def _align_and_stretch_to_page(self, address, binary):
         """
         Return a new (address, binary) that is a multiple of the page size
@@ -605,7 +698,25 @@ class BoardInterface:
         before = address % page_size
         # How much after the end do we also need to write.
         end = address + len(binary)
-        after = (((end + (page_size - 1)) // page_size) * page_size) - end
+        after = -end % page_size
+
+        # Already page aligned, nothing to read.
+        if before == 0 and after == 0:
+            return (address, binary)
+
+        # If we need both ends and the write is small, one read of the whole
+        # span is cheaper than two reads, as every read may mean running an
+        # external tool. We just throw away the middle.
+        MAX_COMBINED_READ = 64 * 1024
+        if (
+            before > 0
+            and after > 0
+            and before + len(binary) + after <= MAX_COMBINED_READ
+        ):
+            start = address - before
+            current = self.read_range(start, before + len(binary) + after)
+            binary = current[:before] + binary + current[before + len(binary) :]
+            return (start, binary)
 
         if before > 0:
             before_address = address - before
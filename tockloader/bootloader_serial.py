@@ -4,18 +4,20 @@ Interface with a board over serial that is using the
 """
 
 import atexit
-import crcmod
+import collections
 import datetime
 import hashlib
 import json
 import logging
 import os
 import platform
+import re
 import socket
 import struct
 import sys
 import time
 import threading
+import zlib
 
 # Windows support in tockloader is currently experimental. Please report bugs,
 # and ideally rough paths to fixing them. The core maintainers have limited
@@ -46,6 +48,17 @@ class BootloaderSerial(BoardInterface):
     # "This was chosen as it is infrequent in .bin files" - immesys
     ESCAPE_CHAR = 0xFC
 
+    # An escape character, and how it has to be sent when it is part of a
+    # message. These are used to (un)escape every packet.
+    ESCAPE = bytes([ESCAPE_CHAR])
+    ESCAPE_ESCAPED = bytes([ESCAPE_CHAR, ESCAPE_CHAR])
+
+    # Layouts of the little-endian fields sent to and received from the
+    # bootloader, compiled once rather than on every command.
+    U32_STRUCT = struct.Struct("<I")
+    ADDRESS_LENGTH_STRUCT = struct.Struct("<II")
+    READ_RANGE_STRUCT = struct.Struct("<IH")
+
     # Commands from this tool to the bootloader.
     # The "X" commands are for external flash.
     COMMAND_PING = 0x01
@@ -109,6 +122,10 @@ class BootloaderSerial(BoardInterface):
         # local data structure to hold them.
         self.attributes = ["uncached"] * 16
 
+        # Whether the bootloader sends two extra bytes after each CRC, see
+        # `_get_crc_internal_flash()`. `None` until the first CRC.
+        self.crc_extra_bytes = None
+
     def _determine_port(self, any=False):
         """
         Helper function to determine which serial port on the host to use to
@@ -134,8 +151,12 @@ class BootloaderSerial(BoardInterface):
             device_name = self.args.port
             must_match = True
 
+        # Enumerating serial ports is relatively slow (on Linux it walks sysfs),
+        # so we only do it once and then filter the list ourselves.
+        all_ports = list(serial.tools.list_ports.comports())
+
         # Look for a matching port
-        ports = sorted(list(serial.tools.list_ports.grep(device_name)))
+        ports = sorted(self._filter_ports(all_ports, device_name))
         if must_match:
             # In the most specific case a user specified a full path that exists
             # and we should use that specific serial port. We need to do more checking, however, as
@@ -174,7 +195,7 @@ class BootloaderSerial(BoardInterface):
                 )
         else:
             # Just find any port. If one, use that. If multiple, ask user.
-            ports = list(serial.tools.list_ports.comports())
+            ports = all_ports
             # Macs will report Bluetooth devices with serial, which is
             # almost certainly never what you want, so drop those.
             ports = [p for p in ports if "Bluetooth-Incoming-Port" not in p.device]
@@ -295,6 +316,20 @@ class BootloaderSerial(BoardInterface):
         # Return serial port device name
         return port.device
 
+    def _filter_ports(self, ports, pattern):
+        """
+        Return the serial ports from `ports` where the device name, description,
+        or hardware ID matches the regular expression `pattern`. This matches
+        the behavior of `serial.tools.list_ports.grep()` without having to
+        enumerate the serial ports again.
+        """
+        r = re.compile(pattern, re.I)
+        return [
+            p
+            for p in ports
+            if r.search(p.device) or r.search(p.description) or r.search(p.hwid)
+        ]
+
     def _configure_serial_port(self, port):
         """
         Helper function to configure the serial port so we can read/write with
@@ -320,6 +355,9 @@ class BootloaderSerial(BoardInterface):
         self.sp.xonxoff = 0
         self.sp.rtscts = 0
         self.sp.timeout = 0.5
+        # Don't let a stuck port hang a large write forever. This is generous
+        # so that many batched pages can still be sent at slow baud rates.
+        self.sp.write_timeout = 10
         # Try to set initial conditions, but not all platforms support them.
         # https://github.com/pyserial/pyserial/issues/124#issuecomment-227235402
         self.sp.dtr = 0
@@ -354,6 +392,25 @@ class BootloaderSerial(BoardInterface):
             logging.error("Error: {}".format(saved_exception))
             raise TockLoaderException("Unable to open serial port")
 
+        # Now that the port is open, try to tune it for sending pages quickly.
+        # These settings are only supported on some platforms and by some
+        # drivers, and everything works without them.
+        if hasattr(self.sp, "set_buffer_size"):
+            # Windows: use larger driver buffers so batched pages are not split
+            # into many small transfers.
+            try:
+                self.sp.set_buffer_size(rx_size=65536, tx_size=65536)
+            except Exception:
+                pass
+        if hasattr(self.sp, "set_low_latency_mode"):
+            # Linux: ask the driver (e.g. FTDI) not to hold received bytes,
+            # which otherwise delays every response from the bootloader.
+            try:
+                self.sp.set_low_latency_mode(True)
+            except Exception:
+                if self.args.debug:
+                    logging.debug("Serial port does not support low latency mode.")
+
     def attached_board_exists(self):
         try:
             # If `_determine_port()` returns, then it found a port, if it
@@ -849,17 +906,37 @@ class BootloaderSerial(BoardInterface):
         """
         Throws an exception if the device does not respond with a PONG.
         """
-        for i in range(30):
-            # Try to ping the SAM4L to ensure it is in bootloader mode
-            ping_pkt = bytes([self.ESCAPE_CHAR, self.COMMAND_PING])
-            self.sp.write(ping_pkt)
-
-            # Read much more than we need in case something got in the
-            # serial channel that we need to clear.
-            ret = self.sp.read(200)
-
-            if len(ret) == 2 and ret[1] == self.RESPONSE_PONG:
-                return
+        # The bootloader answers a ping almost immediately, but it may still be
+        # starting up. Start with a short timeout so we find an active
+        # bootloader quickly, and back off to longer timeouts to give a slow
+        # bootloader time to respond. We have already waited for the serial
+        # port to appear, and if this fails the caller toggles the reset
+        # lines and tries again, so a few seconds is plenty.
+        ping_pkt = bytes([self.ESCAPE_CHAR, self.COMMAND_PING])
+        pong = bytes([self.ESCAPE_CHAR, self.RESPONSE_PONG])
+        original_timeout = self.sp.timeout
+        timeout = 0.05
+        deadline = time.monotonic() + 5
+        try:
+            while time.monotonic() < deadline:
+                # Drop anything stale in the serial channel so that it cannot be
+                # mistaken for the response to this ping. We can't use
+                # `reset_input_buffer()` as it is replaced with a no-op when
+                # the port is configured.
+                if self.sp.in_waiting > 0:
+                    self.sp.read(self.sp.in_waiting)
+
+                # Try to ping the SAM4L to ensure it is in bootloader mode
+                self.sp.timeout = timeout
+                self.sp.write(ping_pkt)
+                ret = self.sp.read(2)
+
+                if ret == pong:
+                    return
+
+                timeout = min(timeout * 2, 0.8)
+        finally:
+            self.sp.timeout = original_timeout
         raise TockLoaderException("No PONG received")
 
     def _issue_command(
@@ -868,21 +945,46 @@ class BootloaderSerial(BoardInterface):
         """
         Setup a command to send to the bootloader and handle the response.
         """
+        # Write the command message.
+        self.sp.write(self._create_command_packet(command, message, sync))
 
-        # Generate the message to send to the bootloader
-        escaped_message = message.replace(
-            bytes([self.ESCAPE_CHAR]), bytes([self.ESCAPE_CHAR, self.ESCAPE_CHAR])
-        )
-        pkt = escaped_message + bytes([self.ESCAPE_CHAR, command])
+        return self._receive_command_response(response_len, response_code, show_errors)
+
+    def _create_command_packet(self, command, message, sync, pkt=None):
+        """
+        Create the bytes to send to the bootloader for a command, escaping the
+        message as needed.
+
+        If `pkt` is a `bytearray`, the command is appended to it rather than to
+        a new buffer. This lets several commands be built in one buffer.
+        """
+        if pkt is None:
+            pkt = bytearray()
 
-        # If there should be a sync/reset message, prepend the outgoing message
-        # with it.
+        # If there should be a sync/reset message, start the outgoing message
+        # with it. The sync message ends with the reset command, which just
+        # clears the bootloader's receive buffer, so it is sent as part of the
+        # same write as the command and no delay is needed between the two.
         if sync:
-            pkt = self.SYNC_MESSAGE + pkt
+            pkt += self.SYNC_MESSAGE
 
-        # Write the command message.
-        self.sp.write(pkt)
+        # Add the escaped message and then the command itself. Most messages
+        # (e.g. pages of a binary) contain no escape characters, and checking
+        # for one is much cheaper than copying the message to escape it.
+        if self.ESCAPE_CHAR in message:
+            pkt += message.replace(self.ESCAPE, self.ESCAPE_ESCAPED)
+        else:
+            pkt += message
+        pkt.append(self.ESCAPE_CHAR)
+        pkt.append(command)
+
+        return pkt
 
+    def _receive_command_response(self, response_len, response_code, show_errors=True):
+        """
+        Read the response to a command from the bootloader and check that it
+        is what we expect.
+        """
         # Response has a two byte header, then response_len bytes. Keeping in
         # mind that bytes can be escaped, keep track of how how many bytes we
         # need to read in.
@@ -894,8 +996,10 @@ class BootloaderSerial(BoardInterface):
         for attempt in range(0, 3):
             # Loop to read in that number of bytes. Only unescape the newest
             # bytes. Start with the header we know we are going to get. This
-            # makes checking for dangling escape characters easier.
-            ret = self.sp.read(2)
+            # makes checking for dangling escape characters easier. Keep any
+            # partial header we already got, since the serial read returns
+            # whatever arrived before the timeout.
+            ret += self.sp.read(2 - len(ret))
 
             # Check if we got two bytes. Otherwise, try the read again.
             if len(ret) == 2:
@@ -920,9 +1024,21 @@ class BootloaderSerial(BoardInterface):
                 )
             return (False, ret[0:2])
 
+        # Read the rest of the response. Each read returns as soon as all of
+        # the requested bytes are available, and otherwise waits for the serial
+        # timeout. If the bootloader stops sending data, give up after a few
+        # reads that return nothing rather than waiting forever.
+        empty_reads = 0
         while bytes_to_read - len(ret) > 0:
             new_data = self.sp.read(bytes_to_read - len(ret))
 
+            if len(new_data) == 0:
+                empty_reads += 1
+                if empty_reads == 3:
+                    break
+                continue
+            empty_reads = 0
+
             # Escape characters are tricky here. We need to make sure that if
             # the last character is an an escape character that it isn't
             # escaping the next character we haven't read yet.
@@ -932,9 +1048,7 @@ class BootloaderSerial(BoardInterface):
                 new_data += self.sp.read(1)
 
             # De-escape, and add to array of read in bytes.
-            ret += new_data.replace(
-                bytes([self.ESCAPE_CHAR, self.ESCAPE_CHAR]), bytes([self.ESCAPE_CHAR])
-            )
+            ret += new_data.replace(self.ESCAPE_ESCAPED, self.ESCAPE)
 
         if len(ret) != 2 + response_len:
             if show_errors:
@@ -980,6 +1094,15 @@ class BootloaderSerial(BoardInterface):
             if not success:
                 # Something went wrong. Go back to old baud rate
                 self.sp.baudrate = 115200
+                logging.warning(
+                    "Could not switch to {} baud, using 115200.".format(baud_rate)
+                )
+            else:
+                logging.info("Switched to {} baud.".format(baud_rate))
+        else:
+            logging.info(
+                "Bootloader does not support changing the baud rate, using 115200."
+            )
 
     def _exit_bootloader(self):
         """
@@ -995,26 +1118,29 @@ class BootloaderSerial(BoardInterface):
         Write pages until a binary has been flashed. binary must have a length
         that is a multiple of page size.
         """
-        # Make sure the binary is a multiple of the page size by padding 0xFFs
+        # Make sure the binary is a multiple of the page size by padding 0xFFs.
+        # The binary may be a bytearray owned by the caller, so build a new
+        # binary rather than extending it in place.
         if len(binary) % self.page_size != 0:
             remaining = self.page_size - (len(binary) % self.page_size)
             if pad:
-                binary += bytes([0xFF] * remaining)
+                binary = binary + b"\xff" * remaining
                 logging.info("Padding binary with {} 0xFFs.".format(remaining))
             else:
                 # Don't pad, actually use the bytes already on the chip
                 missing = self.read_range(address + len(binary), remaining)
-                binary += missing
+                binary = binary + missing
                 logging.info(
                     "Padding binary with {} bytes already on chip.".format(remaining)
                 )
 
-        # Get indices of pages that have valid data to write.
+        # Get indices of pages that have valid data to write. Counting the
+        # zero bytes in each page is done in C, rather than checking each byte
+        # in Python.
         valid_pages = []
         for i in range(len(binary) // self.page_size):
-            if not all(
-                b == 0 for b in binary[i * self.page_size : (i + 1) * self.page_size]
-            ):
+            start = i * self.page_size
+            if binary.count(0, start, start + self.page_size) != self.page_size:
                 valid_pages.append(i)
 
         # Make sure that there is at least one valid page. If we are only trying
@@ -1028,53 +1154,109 @@ class BootloaderSerial(BoardInterface):
         # of a valid page. There might be a usable 0 on the next page. It's
         # unlikely there is more than entire page of valid 0s on the next page.
         ending_pages = []
+        valid_pages_set = set(valid_pages)
         for i in valid_pages:
-            if (not (i + 1) in valid_pages) and (
+            if (not (i + 1) in valid_pages_set) and (
                 (i + 1) < (len(binary) // self.page_size)
             ):
                 ending_pages.append(i + 1)
         valid_pages = valid_pages + ending_pages
 
+        # Don't write pages that already have the correct contents, which is
+        # common when re-flashing the same binary during development.
+        if not getattr(self.args, "force_write", False):
+            to_write = self._get_changed_pages(address, binary, valid_pages)
+            if len(to_write) < len(valid_pages):
+                logging.info(
+                    "Skipping {} page{} already correct on the board.".format(
+                        len(valid_pages) - len(to_write),
+                        helpers.plural(len(valid_pages) - len(to_write)),
+                    )
+                )
+            valid_pages = to_write
+
+        # We can send several pages to the bootloader before waiting for
+        # responses. Whenever a page is acknowledged we send the next one, so
+        # the serial link stays busy instead of idling for a full round trip
+        # on every page. This requires that the bootloader can buffer incoming
+        # data while it writes flash, so by default we only send one page at a
+        # time.
+        window = max(getattr(self.args, "batch_pages", 1), 1)
+
+        # Pages that have been sent but not yet acknowledged, in order.
+        outstanding = collections.deque()
+        next_valid_page = 0
+
+        # Build each write page message in the same buffer, and copy each page
+        # directly from the binary into it.
+        message = bytearray(4 + self.page_size)
+        binary_view = memoryview(binary)
+
+        # Look these up once rather than for every page in the loop below.
+        page_size = self.page_size
+        pack_address = self.U32_STRUCT.pack_into
+        create_command_packet = self._create_command_packet
+
         # Loop through the binary by pages at a time until it has been flashed
         # to the chip.
-        for i in tqdm(valid_pages):
-            # Create the packet that we send to the bootloader. First four
-            # bytes are the address of the page.
-            pkt = struct.pack("<I", address + (i * self.page_size))
-
-            # Next are the bytes that go into the page.
-            pkt += binary[i * self.page_size : (i + 1) * self.page_size]
-
-            # Write to bootloader
-            success, ret = self._issue_command(
-                self.COMMAND_WRITE_PAGE, pkt, True, 0, self.RESPONSE_OK
-            )
+        with tqdm(total=len(valid_pages)) as progress:
+            while next_valid_page < len(valid_pages) or len(outstanding) > 0:
+                # Create packets for as many pages as fit in the window and
+                # write them to the bootloader at once.
+                pkts = bytearray()
+                while next_valid_page < len(valid_pages) and len(outstanding) < window:
+                    i = valid_pages[next_valid_page]
+                    next_valid_page += 1
+
+                    # Create the message that we send to the bootloader. First
+                    # four bytes are the address of the page.
+                    pack_address(message, 0, address + (i * page_size))
+
+                    # Next are the bytes that go into the page.
+                    message[4:] = binary_view[i * page_size : (i + 1) * page_size]
+
+                    create_command_packet(self.COMMAND_WRITE_PAGE, message, True, pkts)
+                    outstanding.append(i)
+                if len(pkts) > 0:
+                    self.sp.write(pkts)
+
+                # Now wait for the oldest page we sent to be written.
+                i = outstanding.popleft()
+                success, ret = self._receive_command_response(0, self.RESPONSE_OK)
+
+                if not success:
+                    logging.error("Error when flashing page")
+                    if len(ret) < 2:
+                        raise TockLoaderException(
+                            "Error: No response when writing page (address: 0x{:X})".format(
+                                address + (i * self.page_size)
+                            )
+                        )
+                    elif ret[1] == self.RESPONSE_BADADDR:
+                        raise TockLoaderException(
+                            "Error: RESPONSE_BADADDR: Invalid address for page to write (address: 0x{:X})".format(
+                                address + (i * self.page_size)
+                            )
+                        )
+                    elif ret[1] == self.RESPONSE_INTERROR:
+                        raise TockLoaderException(
+                            "Error: RESPONSE_INTERROR: Internal error when writing flash"
+                        )
+                    elif ret[1] == self.RESPONSE_BADARGS:
+                        raise TockLoaderException(
+                            "Error: RESPONSE_BADARGS: Invalid length for flash page write"
+                        )
+                    else:
+                        raise TockLoaderException("Error: 0x{:X}".format(ret[1]))
 
-            if not success:
-                logging.error("Error when flashing page")
-                if ret[1] == self.RESPONSE_BADADDR:
-                    raise TockLoaderException(
-                        "Error: RESPONSE_BADADDR: Invalid address for page to write (address: 0x{:X})".format(
-                            address + (i * self.page_size)
+                if self.args.debug:
+                    logging.debug(
+                        "  [{}] Wrote page {}/{}".format(
+                            datetime.datetime.now(), i, len(binary) // self.page_size
                         )
                     )
-                elif ret[1] == self.RESPONSE_INTERROR:
-                    raise TockLoaderException(
-                        "Error: RESPONSE_INTERROR: Internal error when writing flash"
-                    )
-                elif ret[1] == self.RESPONSE_BADARGS:
-                    raise TockLoaderException(
-                        "Error: RESPONSE_BADARGS: Invalid length for flash page write"
-                    )
-                else:
-                    raise TockLoaderException("Error: 0x{:X}".format(ret[1]))
 
-            if self.args.debug:
-                logging.debug(
-                    "  [{}] Wrote page {}/{}".format(
-                        datetime.datetime.now(), i, len(binary) // self.page_size
-                    )
-                )
+                progress.update(1)
 
         # And check the CRC
         self._check_crc(address, binary, valid_pages)
@@ -1082,7 +1264,9 @@ class BootloaderSerial(BoardInterface):
     def read_range(self, address, length):
         # Can only read up to 4095 bytes at a time.
         MAX_READ = 4095
-        read = bytes()
+        # Collect the chunks and join them once at the end, rather than
+        # copying everything read so far for every chunk.
+        chunks = []
         this_length = 0
         remaining = length
         while remaining > 0:
@@ -1093,7 +1277,7 @@ class BootloaderSerial(BoardInterface):
                 this_length = remaining
                 remaining = 0
 
-            message = struct.pack("<IH", address, this_length)
+            message = self.READ_RANGE_STRUCT.pack(address, this_length)
             success, flash = self._issue_command(
                 self.COMMAND_READ_RANGE,
                 message,
@@ -1105,11 +1289,11 @@ class BootloaderSerial(BoardInterface):
             if not success:
                 return b""
             else:
-                read += flash
+                chunks.append(flash)
 
             address += this_length
 
-        return read
+        return b"".join(chunks)
 
     def clear_bytes(self, address):
         logging.debug("Clearing bytes starting at {:#0x}".format(address))
@@ -1126,7 +1310,7 @@ class BootloaderSerial(BoardInterface):
             self.flash_binary(address, binary)
 
     def erase_page(self, address):
-        message = struct.pack("<I", address)
+        message = self.U32_STRUCT.pack(address)
         success, ret = self._issue_command(
             self.COMMAND_ERASE_PAGE, message, True, 0, self.RESPONSE_OK
         )
@@ -1148,7 +1332,7 @@ class BootloaderSerial(BoardInterface):
                 raise TockLoaderException("Error: 0x{:X}".format(ret[1]))
 
     def set_start_address(self, address):
-        message = struct.pack("<I", address)
+        message = self.U32_STRUCT.pack(address)
         success, ret = self._issue_command(
             self.COMMAND_SET_START_ADDRESS, message, True, 0, self.RESPONSE_OK
         )
@@ -1163,7 +1347,7 @@ class BootloaderSerial(BoardInterface):
         """
         Get the bootloader to compute a CRC.
         """
-        message = struct.pack("<II", address, length)
+        message = self.ADDRESS_LENGTH_STRUCT.pack(address, length)
         success, crc = self._issue_command(
             self.COMMAND_CRC_INTERNAL_FLASH,
             message,
@@ -1173,12 +1357,32 @@ class BootloaderSerial(BoardInterface):
         )
 
         # There is a bug in a version of the bootloader where the CRC returns 6
-        # bytes and not just 4. Need to read just in case to grab those extra
-        # bytes.
-        self.sp.read(2)
+        # bytes and not just 4. Need to read those extra bytes if they are
+        # coming. They are sent right after the CRC, so on the first CRC wait
+        # briefly to find out if this bootloader has the bug, and after that
+        # only read them if it does.
+        if self.crc_extra_bytes == None:
+            original_timeout = self.sp.timeout
+            self.sp.timeout = 0.05
+            try:
+                self.crc_extra_bytes = len(self.sp.read(2)) > 0
+            finally:
+                self.sp.timeout = original_timeout
+        elif self.crc_extra_bytes:
+            self.sp.read(2)
 
         if not success:
-            if crc[1] == self.RESPONSE_BADADDR:
+            if len(crc) < 2:
+                raise TockLoaderException(
+                    "Error: No response when computing CRC (address: 0x{:X})".format(
+                        address
+                    )
+                )
+            elif crc[1] == self.RESPONSE_CRC_INTERNAL_FLASH:
+                raise TockLoaderException(
+                    "Error: Incomplete CRC response from the bootloader"
+                )
+            elif crc[1] == self.RESPONSE_BADADDR:
                 raise TockLoaderException(
                     "Error: RESPONSE_BADADDR: Invalid address for CRC (address: 0x{:X})".format(
                         address
@@ -1193,39 +1397,77 @@ class BootloaderSerial(BoardInterface):
 
         return crc
 
+    def _get_sequences(self, l):
+        """
+        Find the start and end of sequences in `l`. [0, 1, 2, 5, 6, 11] would
+        return: [(0, 3), (5, 7), (11, 12)].
+        """
+        sequences = []
+        for i in sorted(l):
+            if len(sequences) > 0 and sequences[-1][1] == i:
+                # Continues the current run.
+                sequences[-1] = (sequences[-1][0], i + 1)
+            else:
+                sequences.append((i, i + 1))
+        return sequences
+
+    def _get_changed_pages(self, address, binary, pages):
+        """
+        Return the pages from `pages` whose contents on the board differ from
+        `binary`. This uses the bootloader's CRC command so that pages which
+        are already correct do not have to be written again. Each run of pages
+        is checked as a whole first, and only if that does not match is it
+        checked in smaller chunks. If several chunks in a row do not match the
+        binary is likely all new, so we stop checking in chunks.
+        """
+        # Number of pages to check with one CRC when a run does not match.
+        CHUNK_PAGES = 8
+        # Number of chunks in a row that must differ before we give up on
+        # checking chunks.
+        MAX_CHANGED_CHUNKS = 2
+
+        # Compute the local CRCs over views of the binary, not copies.
+        binary_view = memoryview(binary)
+
+        def matches(start, last):
+            crc_data = self._get_crc_internal_flash(
+                address + (start * self.page_size), (last - start) * self.page_size
+            )
+            crc_bootloader = self.U32_STRUCT.unpack_from(crc_data)[0]
+            crc_loader = zlib.crc32(
+                binary_view[start * self.page_size : last * self.page_size]
+            )
+            return crc_bootloader == crc_loader
+
+        unchanged = set()
+        changed_chunks = 0
+        for start, last in self._get_sequences(pages):
+            if matches(start, last):
+                unchanged.update(range(start, last))
+            elif last - start > CHUNK_PAGES:
+                for chunk_start in range(start, last, CHUNK_PAGES):
+                    if changed_chunks >= MAX_CHANGED_CHUNKS:
+                        break
+                    chunk_last = min(chunk_start + CHUNK_PAGES, last)
+                    if matches(chunk_start, chunk_last):
+                        unchanged.update(range(chunk_start, chunk_last))
+                        changed_chunks = 0
+                    else:
+                        changed_chunks += 1
+
+        return [i for i in pages if i not in unchanged]
+
     def _check_crc(self, address, binary, valid_pages):
         """
         Compares the CRC of the local binary to the one calculated by the
         bootloader.
         """
+        binary_view = memoryview(binary)
 
-        def get_sequences(l):
-            """
-            Find the start and end of sequences in `l`. [0, 1, 2, 5, 6, 11]
-            would return: [(0, 3), (5, 7), (11, 12)].
-            """
-            sequences = []
-            start = -1
-            last = -1
-            for i in l:
-                if start == -1:
-                    start = i
-                else:
-                    if i - 1 == start or i - 1 == last:
-                        last = i
-                    else:
-                        if last == -1:
-                            last = start + 1
-                        sequences.append((start, last))
-                        start = i
-                        last = -1
-            sequences.append((start, l[-1] + 1))
-            return sequences
-
-        # Compute the CRC for each stretch of pages in the flashed binary.
-        crcs = []
-        for start, last in get_sequences(valid_pages):
-            # Found end of a run. Check CRC.
+        # Check the CRC for each stretch of pages in the flashed binary. Stop
+        # at the first run that does not match, there is no need to have the
+        # bootloader compute the rest.
+        for start, last in self._get_sequences(valid_pages):
             crc_address = address + (start * self.page_size)
             crc_length = (last - start) * self.page_size
 
@@ -1233,25 +1475,22 @@ class BootloaderSerial(BoardInterface):
             crc_data = self._get_crc_internal_flash(crc_address, crc_length)
 
             # Now interpret the returned bytes as the CRC
-            crc_bootloader = struct.unpack("<I", crc_data[0:4])[0]
+            crc_bootloader = self.U32_STRUCT.unpack_from(crc_data)[0]
 
-            # Calculate the CRC locally
-            crc_function = crcmod.mkCrcFun(0x104C11DB7, initCrc=0, xorOut=0xFFFFFFFF)
-            crc_loader = crc_function(
-                binary[start * self.page_size : last * self.page_size], 0
+            # Calculate the CRC locally. The bootloader uses the standard
+            # (reflected) CRC-32 with polynomial 0x04C11DB7, which is what
+            # `zlib.crc32()` implements.
+            crc_loader = zlib.crc32(
+                binary_view[start * self.page_size : last * self.page_size]
             )
 
-            # Add to list of crcs to compare
-            crcs.append((crc_bootloader, crc_loader))
-
-        # Check each run of pages.
-        for crc_bootloader, crc_loader in crcs:
             if crc_bootloader != crc_loader:
                 raise TockLoaderException(
                     "Error: CRC check failed. Expected: 0x{:04x}, Got: 0x{:04x}".format(
                         crc_loader, crc_bootloader
                     )
                 )
+
         logging.info("CRC check passed. Binaries successfully loaded.")
 
     def get_attribute(self, index):
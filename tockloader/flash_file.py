@@ -65,6 +65,7 @@ class FlashFile(BoardInterface):
         # automatically extend the file size if necessary. Thus we must be
         # careful to not write past the end of our virtual flash, if one is
         # defined.
+        self._invalidate_bootloader_region(address, len(binary))
         address = self.translate_address(address)
 
         # Cap the write size to respect the `max_size` setting.
@@ -9,7 +9,6 @@ import string
 import sys
 
 import colorama
-import questionary
 
 
 def set_terminal_title(title):
@@ -62,6 +61,9 @@ def menu_new(options, *, return_type, default_index=None, prompt="", title=""):
     selection.
     """
 
+    # questionary is slow to import, so only do it when we need a menu.
+    import questionary
+
     prompt_to_show = prompt
     if len(title) > len(prompt_to_show):
         prompt_to_show = title
@@ -86,6 +88,8 @@ def menu_new_yes_no(prompt=""):
     """
     Present an interactive yes/no prompt to the user.
     """
+    import questionary
+
     response = questionary.select(
         prompt, choices=["Yes", "No"], default=None, qmark=""
     ).ask()
@@ -141,6 +145,8 @@ def menu(options, *, return_type, default_index=0, prompt="Which option? ", titl
 
 
 def menu_multiple(options, prompt="Make your selections:"):
+    import questionary
+
     choices = questionary.checkbox(prompt, choices=options, qmark="").ask()
     if choices == None:
         return []
@@ -148,6 +154,8 @@ def menu_multiple(options, prompt="Make your selections:"):
 
 
 def menu_multiple_indices(options, prompt="Make your selections:"):
+    import questionary
+
     qchoices = []
     for i, choice in enumerate(options):
         qchoices.append(questionary.Choice(choice, value=i))
@@ -261,12 +269,14 @@ def print_flash(address, flash):
         # Add right padding for not full lines
         if len(b) < 48:
             b = "{0: <48}".format(b)
-        printable = string.ascii_letters + string.digits + string.punctuation + " "
         t = "".join([chr(i) if chr(i) in printable else "." for i in bytes])
         return "{:08x}  {}  |{}|\n".format(addr, b, t)
 
-    out = ""
-    for i, chunk in enumerate(chunks(flash, 16)):
-        out += dump_line(address + (i * 16), chunk)
+    printable = set(string.ascii_letters + string.digits + string.punctuation + " ")
 
-    return out
+    return "".join(
+        [
+            dump_line(address + (i * 16), chunk)
+            for i, chunk in enumerate(chunks(flash, 16))
+        ]
+    )
@@ -45,6 +45,10 @@ class JLinkExe(BoardInterface):
         # able to read all flash addresses tockloader needs to access.
         self.address_maximum = None
 
+        # Cached list of attached JLink emulators, `None` until we have asked
+        # JLinkExe for it.
+        self.emulators = None
+
     def attached_board_exists(self):
         # Get a list of attached jlink devices, check if that list has at least
         # one entry.
@@ -165,7 +169,7 @@ class JLinkExe(BoardInterface):
 
         if binary or not write:
             temp_bin = tempfile.NamedTemporaryFile(
-                mode="w+b", suffix=".bin", delete=delete
+                mode="w+b", suffix=".bin", dir=self._get_temp_dir(), delete=delete
             )
             if write:
                 temp_bin.write(binary)
@@ -181,91 +185,109 @@ class JLinkExe(BoardInterface):
             # Update all of the commands with the name of the binary file
             for i, command in enumerate(commands):
                 commands[i] = command.format(binary=temp_bin.name)
+        else:
+            temp_bin = None
+
+        try:
+            with tempfile.NamedTemporaryFile(
+                mode="w", dir=self._get_temp_dir(), delete=delete
+            ) as jlink_file:
+                for command in commands:
+                    jlink_file.write(command + "\n")
+
+                jlink_file.flush()
+
+                if platform.system() == "Windows":
+                    jlink_file.close()
+
+                jlink_command = "{} -device {} -if {} -speed {} -AutoConnect 1 -jtagconf -1,-1 -CommanderScript {}".format(
+                    self.jlink_cmd,
+                    self.jlink_device,
+                    self.jlink_if,
+                    self.jlink_speed,
+                    jlink_file.name,
+                )
 
-        with tempfile.NamedTemporaryFile(mode="w", delete=delete) as jlink_file:
-            for command in commands:
-                jlink_file.write(command + "\n")
+                # Append target selector if serial number provided.
+                if self.jlink_serial_number:
+                    jlink_command += " -USB {}".format(self.jlink_serial_number)
 
-            jlink_file.flush()
+                logging.debug('Running "{}".'.format(jlink_command))
 
-            if platform.system() == "Windows":
-                jlink_file.close()
+                def print_output(subp):
+                    if subp.stdout:
+                        logging.info(subp.stdout.decode("utf-8"))
+                    if subp.stderr:
+                        logging.info(subp.stderr.decode("utf-8"))
 
-            jlink_command = "{} -device {} -if {} -speed {} -AutoConnect 1 -jtagconf -1,-1 -CommanderScript {}".format(
-                self.jlink_cmd,
-                self.jlink_device,
-                self.jlink_if,
-                self.jlink_speed,
-                jlink_file.name,
-            )
+                p = subprocess.run(
+                    jlink_command.split(),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                )
+                if p.returncode != 0:
+                    logging.error(
+                        "ERROR: JTAG returned with error code " + str(p.returncode)
+                    )
+                    print_output(p)
+                    raise TockLoaderException("JTAG error")
+                elif self.args.debug:
+                    print_output(p)
 
-            # Append target selector if serial number provided.
-            if self.jlink_serial_number:
-                jlink_command += " -USB {}".format(self.jlink_serial_number)
+                # check that there was a JTAG programmer and that it found a device
+                stdout = p.stdout
+                if b"USB...FAILED" in stdout:
+                    raise TockLoaderException(
+                        "ERROR: Cannot find JLink hardware. Is USB attached?"
+                    )
+                if (
+                    b"Can not connect to target." in stdout
+                    or b"Cannot connect to target." in stdout
+                ):
+                    raise TockLoaderException(
+                        "ERROR: Cannot find device. Is JTAG connected?"
+                    )
+                if b"Error while programming flash" in stdout:
+                    raise TockLoaderException("ERROR: Problem flashing.")
 
-            logging.debug('Running "{}".'.format(jlink_command))
+            # On Windows we need to re-open files to do a possible read, and cleanup
+            # files that we could not set to auto delete.
+            if platform.system() == "Windows":
+                ret = None
+                if write == False:
+                    # Wanted to read binary, so lets pull that
+                    with open(temp_bin.name, "rb") as temp_bin:
+                        temp_bin.seek(0, 0)
+                        ret = temp_bin.read()
 
-            def print_output(subp):
-                if subp.stdout:
-                    logging.info(subp.stdout.decode("utf-8"))
-                if subp.stderr:
-                    logging.info(subp.stderr.decode("utf-8"))
+                # Cleanup files on Windows if needed.
+                if not self.args.debug:
+                    os.remove(jlink_file.name)
+                    if binary or not write:
+                        os.remove(temp_bin.name)
 
-            p = subprocess.run(
-                jlink_command.split(), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-            if p.returncode != 0:
-                logging.error(
-                    "ERROR: JTAG returned with error code " + str(p.returncode)
-                )
-                print_output(p)
-                raise TockLoaderException("JTAG error")
-            elif self.args.debug:
-                print_output(p)
-
-            # check that there was a JTAG programmer and that it found a device
-            stdout = p.stdout.decode("utf-8")
-            if "USB...FAILED" in stdout:
-                raise TockLoaderException(
-                    "ERROR: Cannot find JLink hardware. Is USB attached?"
-                )
-            if (
-                "Can not connect to target." in stdout
-                or "Cannot connect to target." in stdout
-            ):
-                raise TockLoaderException(
-                    "ERROR: Cannot find device. Is JTAG connected?"
-                )
-            if "Error while programming flash" in stdout:
-                raise TockLoaderException("ERROR: Problem flashing.")
+                return ret
 
-        # On Windows we need to re-open files to do a possible read, and cleanup
-        # files that we could not set to auto delete.
-        if platform.system() == "Windows":
-            ret = None
             if write == False:
                 # Wanted to read binary, so lets pull that
-                with open(temp_bin.name, "rb") as temp_bin:
-                    temp_bin.seek(0, 0)
-                    ret = temp_bin.read()
-
-            # Cleanup files on Windows if needed.
-            if not self.args.debug:
-                os.remove(jlink_file.name)
-                if binary or not write:
-                    os.remove(temp_bin.name)
-
-            return ret
-
-        if write == False:
-            # Wanted to read binary, so lets pull that
-            temp_bin.seek(0, 0)
-            return temp_bin.read()
+                temp_bin.seek(0, 0)
+                return temp_bin.read()
+        finally:
+            # Close the temporary file now so it is removed right away rather
+            # than whenever it is garbage collected.
+            if temp_bin:
+                temp_bin.close()
 
     def _list_emulators(self):
         """
         Retrieve a list of JLink compatible devices.
+
+        Running JLinkExe is slow, and the attached devices will not change
+        while tockloader is running, so the list is only retrieved once.
         """
+        if self.emulators != None:
+            return self.emulators
+
         # On Windows, do not delete temp files because they delete too fast.
         delete = platform.system() != "Windows"
         if self.args.debug:
@@ -335,6 +357,7 @@ class JLinkExe(BoardInterface):
             if not self.args.debug:
                 os.remove(jlink_file.name)
 
+        self.emulators = emulators
         return emulators
 
     def flash_binary(self, address, binary, pad=False):
@@ -344,6 +367,8 @@ class JLinkExe(BoardInterface):
         if self.address_maximum and address > self.address_maximum:
             raise ChannelAddressErrorException()
 
+        self._invalidate_bootloader_region(address, len(binary))
+
         # Make sure we respect page boundaries in case the chip and jlink
         # implementation will only work correctly when writing entire pages.
         address, binary = self._align_and_stretch_to_page(address, binary)
@@ -405,6 +430,7 @@ class JLinkExe(BoardInterface):
 
         # Write 512 bytes of 0xFF as that seems to work.
         binary = bytes([0xFF] * 512)
+        self._invalidate_bootloader_region(address, len(binary))
         commands = [
             "h\nr",
             "loadbin {{binary}}, {address:#x}".format(address=address),
@@ -477,8 +503,10 @@ class JLinkExe(BoardInterface):
                 self.jlink_speed,
                 jlink_serial_number_str,
             ).split(),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            # Nothing reads this output, and a pipe that is never drained
+            # would eventually block JLinkExe once its buffer fills up.
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
         )
 
         # Delay to give the JLinkExe JTAG connection time to start before running
@@ -491,12 +519,14 @@ class JLinkExe(BoardInterface):
             self.jlink_rtt_cmd = "JLinkRTTClient"
 
         logging.status("Starting {} to listen for messages.".format(self.jlink_rtt_cmd))
+        # Send stderr to the same pipe, as nothing would read it from a pipe
+        # of its own and JLinkRTTClient would block once that filled up.
         p = subprocess.Popen(
             "{}".format(self.jlink_rtt_cmd),
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
         )
-        for stdout_line in iter(p.stdout.readline, ""):
-            l = stdout_line.decode("utf-8")
+        for stdout_line in iter(p.stdout.readline, b""):
+            l = stdout_line.decode("utf-8", errors="replace")
             if not l.startswith("###RTT Client: *"):
                 print(l, end="")
@@ -22,7 +22,6 @@ import time
 import urllib.parse
 
 import argcomplete
-import crcmod
 
 from . import helpers
 from .exceptions import TockLoaderException
@@ -239,20 +238,38 @@ def command_unsticky_app(args):
 def command_flash(args):
     check_and_run_make(args)
 
-    # Load in all binaries
-    binary = bytes()
-    count = 0
+    # Check that we aren't trying to flash any `.hex` files.
     for binary_name in args.binary:
-        # check that file isn't a `.hex` file
         if binary_name.endswith(".hex"):
             exception_string = 'Error: Cannot flash ".hex" files.'
             exception_string += ' Likely you meant to use a ".bin" file but used an intel hex file by accident.'
             raise TockLoaderException(exception_string)
 
-        # add contents to binary
-        with open(binary_name, "rb") as f:
-            binary += f.read()
-        count += 1
+    # Load in all binaries. We read each file directly into its place in a
+    # single buffer so we only ever hold one copy of the combined binary.
+    # Pipes and other special files have no size up front, so those are just
+    # read in full.
+    if all(os.path.isfile(binary_name) for binary_name in args.binary):
+        sizes = [os.path.getsize(binary_name) for binary_name in args.binary]
+        binary = bytearray(sum(sizes))
+        with memoryview(binary) as binary_view:
+            offset = 0
+            for binary_name, size in zip(args.binary, sizes):
+                with open(binary_name, "rb") as f:
+                    read = f.readinto(binary_view[offset : offset + size])
+                if read != size:
+                    raise TockLoaderException(
+                        "Could only read {} of {} bytes from {}".format(
+                            read, size, binary_name
+                        )
+                    )
+                offset += size
+    else:
+        binary = bytearray()
+        for binary_name in args.binary:
+            with open(binary_name, "rb") as f:
+                binary += f.read()
+    count = len(args.binary)
 
     # Check if the user asked us to pad the binary with some additional bytes.
     pad = None
@@ -833,7 +850,7 @@ def main():
         "--baud-rate",
         default=115200,
         type=int,
-        help="If using serial, set the target baud rate.",
+        help="If using serial, set the target baud rate. Higher rates make flashing faster, and tockloader falls back to 115200 if the bootloader or serial adapter does not support the rate.",
     )
     parent_channel.add_argument(
         "--no-bootloader-entry",
@@ -1082,6 +1099,17 @@ def main():
         nargs=2,
         action="append",
     )
+    flash.add_argument(
+        "--batch-pages",
+        help="If using serial, number of pages that can be sent before the bootloader has responded",
+        type=int,
+        default=1,
+    )
+    flash.add_argument(
+        "--force-write",
+        help="If using serial, write every page even if it already matches the binary",
+        action="store_true",
+    )
 
     read = subparser.add_parser(
         "read", parents=[parent, parent_channel], help="Read arbitrary flash memory"
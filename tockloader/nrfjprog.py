@@ -56,9 +56,28 @@ class nrfjprog(BoardInterface):
 
     def flash_binary(self, address, binary, pad=False):
         """
-        Write using nrfjprog.
+        Write using nrfjprog. Only the blocks of `binary` that differ from what
+        is already in flash are written.
         """
-        self.nrfjprog.qspi_write(address - self.qspi_address, binary)
+        # Number of bytes to compare at a time.
+        BLOCK_SIZE = 4096
+
+        qspi_offset = address - self.qspi_address
+        current = self.nrfjprog.qspi_read(qspi_offset, len(binary))
+
+        # Find the blocks that need to change, and merge adjacent ones so that
+        # each run of changed blocks is a single write.
+        spans = []
+        for start in range(0, len(binary), BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, len(binary))
+            if current[start:end] != binary[start:end]:
+                if len(spans) > 0 and spans[-1][1] == start:
+                    spans[-1] = (spans[-1][0], end)
+                else:
+                    spans.append((start, end))
+
+        for start, end in spans:
+            self.nrfjprog.qspi_write(qspi_offset + start, binary[start:end])
 
     def read_range(self, address, length):
         """
@@ -6,24 +6,43 @@ list of strings that are interpreted as flags to the OpenOCD class in this file.
 These allow individual boards to have custom operations in a semi-reasonable
 way. Note, I just made up the string (flag) names; they are not passed to
 OpenOCD directly.
+
+To avoid starting OpenOCD and connecting to the target for every operation,
+this interface keeps one OpenOCD running for the whole session and sends it
+commands over its Tcl RPC port. The `nodaemon` flag goes back to running a
+new OpenOCD for each operation.
 """
 
+import collections
+import concurrent.futures
+import contextlib
 import logging
 import platform
+import re
 import shlex
 import socket
 import subprocess
-import tempfile
+import threading
 import time
 
 from .board_interface import BoardInterface
 from .exceptions import TockLoaderException
 
-# global static variable for collecting temp files for Windows
-collect_temp_files = []
-
 
 class OpenOCD(BoardInterface):
+    # Marks the end of each message to and from the OpenOCD Tcl RPC server.
+    TCL_RPC_TERMINATOR = b"\x1a"
+
+    # How many lines of OpenOCD output to keep for error messages.
+    OUTPUT_CONTEXT_LINES = 200
+
+    # Largest read done with `read_memory` instead of `dump_image`. Bigger
+    # reads are cheaper through a file than as a Tcl list of numbers.
+    MAX_TCL_READ = 4096
+
+    # Seconds to wait for each OpenOCD run in `_list_emulators()`.
+    PROBE_TIMEOUT = 10
+
     def __init__(self, args):
         # Must call the generic init first.
         super().__init__(args)
@@ -31,6 +50,29 @@ class OpenOCD(BoardInterface):
         # Command can be passed in as an argument, otherwise use default.
         self.openocd_cmd = getattr(self.args, "openocd_cmd")
 
+        # OpenOCD we keep running in the background, see
+        # `_ensure_tcl_server()`.
+        self.tcl_server = None
+        self.tcl_server_startup = None
+        self.tcl_server_failed = False
+        self.tcl_read_memory_failed = False
+        self.tcl_socket = None
+
+        # The last lines the background OpenOCD printed, shown if a command
+        # fails.
+        self.tcl_server_output = collections.deque(maxlen=self.OUTPUT_CONTEXT_LINES)
+
+        # Writes waiting to be run, see `batch()`.
+        self.pending_writes = None
+
+        # Cached list of boards found by `_list_emulators()`, `None` until we
+        # have probed for them.
+        self.emulators = None
+
+        # The parts of the OpenOCD script around our commands, set by
+        # `open_link_to_board()`.
+        self.script_parts = None
+
     def attached_board_exists(self):
         # Get a list of attached devices, check if that list has at least
         # one entry.
@@ -90,49 +132,49 @@ class OpenOCD(BoardInterface):
                 "Unknown OpenOCD board name. You must pass --openocd-board."
             )
 
-    def _gather_openocd_cmdline(self, commands, binary, write=True, exit=True):
-        """
-        - `commands`: List of openocd commands. Use {binary} for where the name
-          of the binary file should be substituted.
-        - `binary`: A bytes() object that will be used to write to the board.
-        - `write`: Set to true if the command writes binaries to the board. Set
-          to false if the command will read bits from the board.
-        - `exit`: When `True`, openocd will exit after executing commands.
-        """
+        # The settings are fixed now, so build the script parts once.
+        self.script_parts = self._make_openocd_script_parts()
 
-        # in Windows, you can't mark delete bc they delete too fast
-        delete = platform.system() != "Windows"
-        if self.args.debug:
-            delete = False
+    def _prepare_binary_file(self, commands, binary, write=True, index=0):
+        """
+        Set up scratch file number `index` for OpenOCD to read `binary` from,
+        or to write a read into, and substitute its name for {binary} in
+        `commands`.
 
-        if binary or not write:
-            temp_bin = tempfile.NamedTemporaryFile(
-                mode="w+b", suffix=".bin", delete=delete
-            )
-            if write:
-                temp_bin.write(binary)
+        Returns `(commands, scratch_file)`. `scratch_file` is `None` if no
+        file was needed.
+        """
+        if not binary and write:
+            return (commands, None)
 
-            temp_bin.flush()
+        scratch_file = self._get_scratch_file(index)
+        scratch_file.seek(0)
+        scratch_file.truncate()
+        if write:
+            scratch_file.write(binary)
+        scratch_file.flush()
 
-            if platform.system() == "Windows":
-                # For Windows, forward slashes need to be escaped
-                temp_bin.name = temp_bin.name.replace("\\", "\\\\\\")
-                # For Windows, files need to be manually deleted
-                global collect_temp_files
-                collect_temp_files += [temp_bin.name]
+        name = scratch_file.name
+        if platform.system() == "Windows":
+            # For Windows, forward slashes need to be escaped
+            name = name.replace("\\", "\\\\\\")
 
-            # Update the commands with the name of the binary file
-            commands = [command.format(binary=temp_bin.name) for command in commands]
-        else:
-            temp_bin = None
+        # Update the commands with the name of the binary file
+        commands = [command.format(binary=name) for command in commands]
 
-        # Create the actual openocd command and run it. All of this can be
-        # customized if needed for an unusual board.
+        return (commands, scratch_file)
 
+    def _make_openocd_script_parts(self):
+        """
+        Build the `(prefix, source, init, cmd_prefix, cmd_suffix)` strings
+        that go around the commands we ask OpenOCD to run. All of this can be
+        customized if needed for an unusual board.
+        """
         # Defaults.
         prefix = ""
         source = "source [find board/{board}];".format(board=self.openocd_board)
-        cmd_prefix = "init; reset init; halt;"
+        init = "init;"
+        cmd_prefix = "reset init; halt;"
         cmd_suffix = ""
 
         # Do the customizations
@@ -143,97 +185,431 @@ class OpenOCD(BoardInterface):
         if self.openocd_board == "external":
             source = ""
         if "noreset" in self.openocd_options:
-            cmd_prefix = "init; halt;"
+            cmd_prefix = "halt;"
         if "nocmdprefix" in self.openocd_options:
+            init = ""
             cmd_prefix = ""
         if "resume" in self.openocd_options:
             cmd_suffix = "soft_reset_halt; resume;"
+
+        return (prefix, source, init, cmd_prefix, cmd_suffix)
+
+    def _get_openocd_script_parts(self, exit=True, read=False):
+        """
+        Return the `(prefix, source, init, cmd_prefix, cmd_suffix)` strings
+        that go around the commands we ask OpenOCD to run. With `exit`, the
+        suffix also makes OpenOCD exit when it is done. Set `read` if the
+        commands only read from the board.
+        """
+        if self.script_parts == None:
+            self.script_parts = self._make_openocd_script_parts()
+
+        prefix, source, init, cmd_prefix, cmd_suffix = self.script_parts
+
+        # Reading only needs the target halted. Resetting it takes time and
+        # is only needed to get the target ready for flashing.
+        if read and cmd_prefix:
+            cmd_prefix = "halt;"
         if exit:
             cmd_suffix += "exit"
 
-        command_param = "{prefix} {source} {cmd_prefix} {cmd} {cmd_suffix}".format(
-            prefix=prefix,
-            source=source,
-            cmd_prefix=cmd_prefix,
-            cmd="; ".join(commands),
-            cmd_suffix=cmd_suffix,
+        return (prefix, source, init, cmd_prefix, cmd_suffix)
+
+    def _build_openocd_cmdline(self, commands, exit=True, read=False):
+        """
+        Return the argument list that runs OpenOCD with the list of
+        `commands`. Any {binary} must already be filled in.
+        """
+        prefix, source, init, cmd_prefix, cmd_suffix = self._get_openocd_script_parts(
+            exit, read
         )
 
-        return (
-            "{openocd_cmd} -c {cmd} --debug".format(
-                openocd_cmd=self.openocd_cmd,
-                cmd=shlex.quote(command_param),
-            ),
-            temp_bin,
+        command_param = " ".join(
+            [prefix, source, init, cmd_prefix, "; ".join(commands), cmd_suffix]
         )
 
+        # OpenOCD's debug output is large, so only ask for it when we are
+        # going to show it.
+        debug = ["--debug"] if self.args.debug else []
+
+        return shlex.split(self.openocd_cmd) + ["-c", command_param] + debug
+
+    def _gather_openocd_cmdline(self, commands, binary, write=True, exit=True):
+        """
+        - `commands`: List of openocd commands. Use {binary} for where the name
+          of the binary file should be substituted.
+        - `binary`: A bytes() object that will be used to write to the board.
+        - `write`: Set to true if the command writes binaries to the board. Set
+          to false if the command will read bits from the board.
+        - `exit`: When `True`, openocd will exit after executing commands.
+        """
+        commands, scratch_file = self._prepare_binary_file(commands, binary, write)
+        return (self._build_openocd_cmdline(commands, exit), scratch_file)
+
     def _run_openocd_commands(self, commands, binary, write=True):
-        openocd_command, temp_bin = self._gather_openocd_cmdline(
-            [commands], binary, write
-        )
+        """
+        Run `commands` in OpenOCD. When `write` is `False`, return what the
+        commands read into the {binary} file.
+        """
+        commands, scratch_file = self._prepare_binary_file([commands], binary, write)
+        self._run_openocd_script(commands, read=not write)
+
+        if write == False:
+            # Wanted to read binary, so lets pull that
+            scratch_file.seek(0, 0)
+            return scratch_file.read()
+
+    def _run_openocd_script(self, commands, read=False):
+        """
+        Run the list of `commands` in OpenOCD. Any {binary} must already be
+        filled in.
+        """
+        # Use the OpenOCD that is already running if we can, so we do not pay
+        # for starting OpenOCD and connecting to the target on every command.
+        if self._ensure_tcl_server():
+            self._run_tcl_server_commands(commands, read)
+            return
 
-        logging.debug('Running "{}".'.format(openocd_command.replace("$", "\\$")))
+        openocd_args = self._build_openocd_cmdline(commands, read=read)
+
+        logging.debug('Running "{}".'.format(self._format_cmdline(openocd_args)))
+
+        # Handle OpenOCD's output as it arrives rather than collecting all of
+        # it, as when debugging there can be a lot. We only keep the end of it
+        # to show if something goes wrong.
+        output = collections.deque(maxlen=self.OUTPUT_CONTEXT_LINES)
+        with subprocess.Popen(
+            openocd_args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        ) as p:
+            for line in p.stdout:
+                # Only decode the output if we are going to show it.
+                output.append(line)
+                if self.args.debug:
+                    logging.info(line.decode("utf-8", errors="replace").rstrip())
 
-        def print_output(subp):
-            response = ""
-            if subp.stdout:
-                response += subp.stdout.decode("utf-8")
-            if subp.stderr:
-                response += subp.stderr.decode("utf-8")
-            logging.info(response)
-            return response
+                # Stop early on errors OpenOCD will not recover from.
+                if b"Can't find board/" in line:
+                    p.kill()
+                    raise TockLoaderException(
+                        "ERROR: Cannot find the board configuration file. \
+You may need to update OpenOCD to the version in latest git master."
+                    )
+                # check that there was a JTAG programmer and that it found a device
+                if b"Error: No J-Link device found." in line:
+                    p.kill()
+                    raise TockLoaderException(
+                        "ERROR: Cannot find hardware. Is USB attached?"
+                    )
 
-        p = subprocess.run(
-            shlex.split(openocd_command), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
         if p.returncode != 0:
             logging.error(
                 "ERROR: openocd returned with error code " + str(p.returncode)
             )
-            out = print_output(p)
-            if "Can't find board/" in out:
-                raise TockLoaderException(
-                    "ERROR: Cannot find the board configuration file. \
-You may need to update OpenOCD to the version in latest git master."
+            if not self.args.debug:
+                logging.info(b"".join(output).decode("utf-8", errors="replace"))
+            raise TockLoaderException("openocd error")
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Queue the writes made inside the `with` block and run them together
+        in OpenOCD at the end, so the target is only reset and halted once
+        for all of them. Reading flash that a queued write covers runs the
+        queued writes first.
+        """
+        # Nested batches just join the outer one.
+        if self.pending_writes != None:
+            yield
+            return
+
+        self.pending_writes = []
+        try:
+            yield
+            self._flush_pending_commands()
+        finally:
+            self.pending_writes = None
+
+    def _queue_write(self, command, address, binary):
+        """
+        Save a write for `batch()` to run later. `command` still has
+        {address} in it, and `address` is in OpenOCD addressing.
+
+        A write that carries on right where the last queued write ended, with
+        the same command, is added on to it so both go in one command.
+        """
+        if len(self.pending_writes) > 0:
+            last_command, last_address, last_binary = self.pending_writes[-1]
+            if last_command == command and last_address + len(last_binary) == address:
+                self.pending_writes[-1] = (command, last_address, last_binary + binary)
+                return
+
+        self.pending_writes.append((command, address, binary))
+
+    def _flush_pending_commands(self):
+        """
+        Run all of the writes queued by `batch()` as one OpenOCD script.
+        """
+        pending = self.pending_writes
+        self.pending_writes = []
+        if len(pending) == 0:
+            return
+
+        logging.debug("Running {} batched OpenOCD writes.".format(len(pending)))
+
+        # Each write gets its own scratch file.
+        all_commands = []
+        for index, (command, address, binary) in enumerate(pending):
+            command = command.format(address=address)
+            commands, _ = self._prepare_binary_file([command], binary, index=index)
+            all_commands += commands
+
+        self._run_openocd_script(all_commands)
+
+    def _flush_pending_commands_before_read(self, address, length):
+        """
+        Run the queued writes if any of them might change the `length` bytes
+        at `address` (in OpenOCD addressing), so the read sees them.
+        """
+        if self.pending_writes == None:
+            return
+
+        for _, write_address, binary in self.pending_writes:
+            write_end = write_address + len(binary)
+            if write_address < address + length and address < write_end:
+                self._flush_pending_commands()
+                return
+
+    def _ensure_tcl_server(self):
+        """
+        Make sure there is a persistent OpenOCD running with the current
+        settings that we can send commands to over its Tcl RPC port. Returns
+        `False` if that is not possible, in which case callers should run a
+        new OpenOCD for each command instead.
+        """
+        if self.tcl_server_failed or "nodaemon" in self.openocd_options:
+            return False
+
+        prefix, source, init, _, _ = self._get_openocd_script_parts(exit=False)
+        startup = "{} {} {}".format(prefix, source, init)
+
+        if self.tcl_server != None:
+            # The settings can change once we learn more about the board, for
+            # example from its attributes. Restart OpenOCD if that happens.
+            if self.tcl_server_startup == startup and self.tcl_server.poll() == None:
+                return True
+            self._stop_tcl_server()
+
+        if not self._start_tcl_server(startup):
+            logging.debug("Could not start a persistent OpenOCD.")
+            logging.debug("Running a new OpenOCD for each command instead.")
+            self.tcl_server_failed = True
+            return False
+
+        return True
+
+    def _start_tcl_server(self, startup):
+        """
+        Start OpenOCD in the background running `startup`, and connect to its
+        Tcl RPC server. Returns `True` on success.
+        """
+        # Find a free port for the Tcl server so we do not clash with any
+        # other OpenOCD instance running on this machine.
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+        command_param = (
+            "tcl_port {port}; gdb_port disabled; telnet_port disabled; {startup}"
+        ).format(port=port, startup=startup)
+        openocd_args = shlex.split(self.openocd_cmd) + ["-c", command_param]
+
+        logging.debug('Starting "{}".'.format(self._format_cmdline(openocd_args)))
+
+        try:
+            ocd_p = subprocess.Popen(
+                openocd_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+            )
+        except FileNotFoundError:
+            return False
+
+        # OpenOCD keeps printing while it runs in the background, so read its
+        # output in a separate thread.
+        self.tcl_server_output.clear()
+        threading.Thread(
+            target=self._collect_tcl_server_output, args=(ocd_p.stdout,), daemon=True
+        ).start()
+
+        # OpenOCD opens the Tcl port once it has finished `init`.
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and ocd_p.poll() == None:
+            try:
+                tcl = socket.create_connection(("127.0.0.1", port), timeout=1)
+            except OSError:
+                time.sleep(0.1)
+                continue
+
+            # Flash operations can take a while, so do not time out on them.
+            tcl.settimeout(None)
+            self.tcl_server = ocd_p
+            self.tcl_server_startup = startup
+            self.tcl_socket = tcl
+            return True
+
+        if ocd_p.poll() == None:
+            ocd_p.kill()
+        ocd_p.wait()
+        return False
+
+    def _collect_tcl_server_output(self, stdout):
+        """
+        Keep the last lines the background OpenOCD prints so they can be
+        shown if a command fails. When debugging, show every line as well.
+        """
+        with stdout:
+            for line in stdout:
+                self.tcl_server_output.append(line)
+                if self.args.debug:
+                    logging.debug(line.decode("utf-8", errors="replace").rstrip())
+
+    def _stop_tcl_server(self):
+        """
+        Shut down the background OpenOCD, if there is one.
+        """
+        if self.tcl_server == None:
+            return
+
+        try:
+            self._tcl_rpc("shutdown")
+        except (OSError, TockLoaderException):
+            pass
+        self.tcl_socket.close()
+
+        try:
+            self.tcl_server.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.tcl_server.kill()
+            self.tcl_server.wait()
+
+        self.tcl_server = None
+        self.tcl_server_startup = None
+        self.tcl_socket = None
+
+    def _tcl_rpc(self, command):
+        """
+        Send a single command to the OpenOCD Tcl RPC server and return the
+        result as a string.
+        """
+        self.tcl_socket.sendall(command.encode("utf-8") + self.TCL_RPC_TERMINATOR)
+
+        response = bytearray()
+        while not response.endswith(self.TCL_RPC_TERMINATOR):
+            received = self.tcl_socket.recv(4096)
+            if len(received) == 0:
+                raise TockLoaderException("OpenOCD closed the connection.")
+            response += received
+
+        return response[:-1].decode("utf-8", errors="replace")
+
+    def _run_tcl_server_commands(self, commands, read=False):
+        """
+        Like `_run_openocd_script()`, but runs `commands` in the OpenOCD
+        started by `_ensure_tcl_server()`.
+        """
+        error = self._try_tcl_server_commands(commands, read)
+        if error != None:
+            logging.error("ERROR: openocd command failed: {}".format(error))
+            if not self.args.debug:
+                logging.info(
+                    b"".join(self.tcl_server_output).decode("utf-8", errors="replace")
                 )
+            logging.info(
+                "Use --debug to see all OpenOCD output, or --openocd-options nodaemon to run a new OpenOCD for each command."
+            )
             raise TockLoaderException("openocd error")
-        elif self.args.debug:
-            print_output(p)
 
-        # check that there was a JTAG programmer and that it found a device
-        stdout = p.stdout.decode("utf-8")
-        if "Error: No J-Link device found." in stdout:
-            raise TockLoaderException("ERROR: Cannot find hardware. Is USB attached?")
+    def _try_tcl_server_commands(self, commands, read=False):
+        """
+        Run `commands` in the background OpenOCD. Returns `None` if they
+        succeeded, or the error message if not.
+        """
+        _, _, _, cmd_prefix, cmd_suffix = self._get_openocd_script_parts(
+            exit=False, read=read
+        )
+        script = "{} {} {}".format(cmd_prefix, "; ".join(commands), cmd_suffix)
+
+        logging.debug('Running "{}" in OpenOCD.'.format(script))
 
-        if write == False:
-            # Wanted to read binary, so lets pull that
-            temp_bin.seek(0, 0)
-            return temp_bin.read()
+        # Only keep the output from this script in case it fails.
+        self.tcl_server_output.clear()
+
+        # The RPC server returns the result of the script whether or not it
+        # failed, so use `catch` to find out.
+        if self._tcl_rpc("catch {{{}}} tockloader_error".format(script)) != "0":
+            return self._tcl_rpc("set tockloader_error")
+        return None
+
+    def _read_range_tcl_server(self, address, length):
+        """
+        Read flash with `read_memory` in the background OpenOCD, which
+        returns the bytes over the RPC connection instead of through a
+        temporary file. Returns `None` if this is not possible.
+        """
+        if self.tcl_read_memory_failed or not self._ensure_tcl_server():
+            return None
+
+        # Keep the result in a variable, as the command suffix may run after
+        # `read_memory`.
+        error = self._try_tcl_server_commands(
+            ["set tockloader_data [read_memory {:#x} 8 {}]".format(address, length)],
+            read=True,
+        )
+        if error != None:
+            # Older versions of OpenOCD do not have `read_memory`.
+            logging.debug("read_memory failed, using dump_image: {}".format(error))
+            self.tcl_read_memory_failed = True
+            return None
+
+        return bytes(int(x, 0) for x in self._tcl_rpc("set tockloader_data").split())
 
     def _list_emulators(self):
         """
         Return a list of board names that are attached to the host.
+
+        Probing runs OpenOCD several times, and the attached boards will not
+        change while tockloader is running, so this only probes once.
         """
+        if self.emulators != None:
+            return self.emulators
+
+        # The probes below run at the same time, so make sure they do not all
+        # try to open the same server ports.
+        openocd_cmd = (
+            '{openocd_cmd} -c "gdb_port disabled; tcl_port disabled; '
+            'telnet_port disabled"'
+        ).format(openocd_cmd=self.openocd_cmd)
+
         openocd_commands = []
 
         # I'm not sure there is a magic way to discover all attached OpenOCD
         # compatible devices. So, we do our best and try some.
         openocd_commands.append(
-            '{openocd_cmd} -c "interface jlink"'.format(openocd_cmd=self.openocd_cmd)
+            '{openocd_cmd} -c "interface jlink"'.format(openocd_cmd=openocd_cmd)
         )
         openocd_commands.append(
             '{openocd_cmd} -c "interface cmsis-dap; transport select swd; source [find target/nrf52.cfg]; init; exit;"'.format(
-                openocd_cmd=self.openocd_cmd
+                openocd_cmd=openocd_cmd
             )
         )
         openocd_commands.append(
             '{openocd_cmd} -c "source [find interface/ftdi/digilent-hs1.cfg]; ftdi_device_desc \\"Digilent USB Device\\"; adapter_khz 10000; transport select jtag; init; exit"'.format(
-                openocd_cmd=self.openocd_cmd
+                openocd_cmd=openocd_cmd
             )
         )
         openocd_commands.append(
             '{openocd_cmd} -c "source [find interface/stlink.cfg]; transport select hla_swd; source [find target/stm32f4x.cfg]; init; exit;"'.format(
-                openocd_cmd=self.openocd_cmd
+                openocd_cmd=openocd_cmd
             )
         )
 
@@ -249,33 +625,47 @@ You may need to update OpenOCD to the version in latest git master."
             ("stm32f4x.cpu", "stm32f4discovery"),
         ]
 
+        # Find all of the magic strings in one pass over each probe's output.
+        magic_re = re.compile(
+            b"|".join(re.escape(magic.encode()) for magic, _ in magic_strings_boards)
+        )
+
         emulators = []
 
-        def print_output(subp):
-            response = ""
-            if subp.stdout:
-                response += subp.stdout.decode("utf-8")
-            if subp.stderr:
-                response += subp.stderr.decode("utf-8")
-            logging.info(response)
-            return response
+        def probe(openocd_command):
+            """
+            Run one probe and return the set of magic strings found in its
+            output.
+            """
+            logging.debug('Running "{}".'.format(openocd_command))
+            with subprocess.Popen(
+                shlex.split(openocd_command),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            ) as p:
+                try:
+                    output, _ = p.communicate(timeout=self.PROBE_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    # Do not let one stuck adapter hold up the others.
+                    p.kill()
+                    output, _ = p.communicate()
 
-        try:
-            for openocd_command in openocd_commands:
-                logging.debug('Running "{}".'.format(openocd_command))
-                p = subprocess.run(
-                    shlex.split(openocd_command),
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
-                if self.args.debug:
-                    print_output(p)
+            if self.args.debug:
+                logging.info(output.decode("utf-8", errors="replace"))
 
-                # Parse all output to look for a device.
-                stdouterr = p.stdout.decode("utf-8") + p.stderr.decode("utf-8")
+            return set(magic.decode() for magic in magic_re.findall(output))
 
+        try:
+            # Each probe mostly waits on OpenOCD and the USB adapters, so run
+            # them all at once rather than one after the other.
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(openocd_commands)
+            ) as executor:
+                results = list(executor.map(probe, openocd_commands))
+
+            for found in results:
                 for magic_string, board in magic_strings_boards:
-                    if magic_string in stdouterr:
+                    if magic_string in found:
                         emulators.append(board)
         except FileNotFoundError as e:
             if self.args.debug:
@@ -285,12 +675,15 @@ You may need to update OpenOCD to the version in latest git master."
             # Any other error just ignore...this is only for convenience.
             pass
 
+        self.emulators = emulators
         return emulators
 
     def flash_binary(self, address, binary, pad=False):
         """
         Write using openocd `program` command.
         """
+        self._invalidate_bootloader_region(address, len(binary))
+
         # The "normal" flash command uses `program`.
         command = "program {{binary}} verify {address:#x}; reset;"
 
@@ -309,6 +702,11 @@ You may need to update OpenOCD to the version in latest git master."
         # command addressing.
         address = self.translate_address(address)
 
+        if self.pending_writes != None:
+            # We are in a `batch()`, so save this to run with the rest.
+            self._queue_write(command, address, binary)
+            return
+
         # Substitute the key arguments.
         command = command.format(address=address)
 
@@ -328,6 +726,17 @@ You may need to update OpenOCD to the version in latest git master."
         # command addressing.
         address = self.translate_address(address)
 
+        # Anything we read has to include the writes before it.
+        self._flush_pending_commands_before_read(address, length)
+
+        # Small reads can come straight back over the connection to the
+        # background OpenOCD, as long as the board does not need a special
+        # read command.
+        if "read" not in self.openocd_commands and 0 < length <= self.MAX_TCL_READ:
+            read = self._read_range_tcl_server(address, length)
+            if read != None:
+                return read
+
         logging.debug('Using read command: "{}"'.format(command))
 
         # Substitute the key arguments.
@@ -353,6 +762,14 @@ You may need to update OpenOCD to the version in latest git master."
         binary = bytes([0xFF] * 8)
         self.flash_binary(address, binary)
 
+    def exit_bootloader_mode(self):
+        """
+        Stop the background OpenOCD and clean up now that we are done with the
+        board.
+        """
+        self._stop_tcl_server()
+        self._remove_scratch_files()
+
     def determine_current_board(self):
         if self.board and self.arch and self.openocd_board and self.page_size > 0:
             # These are already set! Yay we are done.
@@ -369,6 +786,7 @@ You may need to update OpenOCD to the version in latest git master."
                 self.arch = attribute["value"]
             if attribute and attribute["key"] == "openocd":
                 self.openocd_board = attribute["value"]
+                self.script_parts = None
             if attribute and attribute["key"] == "pagesize" and self.page_size == 0:
                 self.page_size = attribute["value"]
 
@@ -388,9 +806,11 @@ You may need to update OpenOCD to the version in latest git master."
             raise TockLoaderException("Could not determine the current page size")
 
     def run_terminal(self):
+        # The RTT OpenOCD needs the debug adapter to itself.
+        self._stop_tcl_server()
         self.open_link_to_board()
         logging.status("Starting OpenOCD RTT connection.")
-        openocd_command, _ = self._gather_openocd_cmdline(
+        openocd_args, _ = self._gather_openocd_cmdline(
             [
                 'rtt setup 0x20000000 65536 "SEGGER RTT"',
                 "init",
@@ -402,51 +822,61 @@ You may need to update OpenOCD to the version in latest git master."
             exit=False,
         )
 
-        logging.debug('Running "{}".'.format(openocd_command.replace("$", "\\$")))
+        logging.debug('Running "{}".'.format(self._format_cmdline(openocd_args)))
 
         cleanup = []
         try:
             # This won't print messages from OpenOCD,
             # to avoid interfering with the console.
             ocd_p = subprocess.Popen(
-                shlex.split(openocd_command),
+                openocd_args,
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
             )
             cleanup.append(ocd_p.wait)
             cleanup.append(ocd_p.kill)
 
-            listener = socket.socket()
-            MAX_TRIES = 3
-            for i in range(MAX_TRIES):
-                # Delay to give the connection time to start before running
-                # the RTT listener.
-                time.sleep(1)
-                if ocd_p.poll():
+            # Connect as soon as OpenOCD opens the RTT port, giving it a few
+            # seconds to get there.
+            listener = None
+            deadline = time.monotonic() + 3
+            while time.monotonic() < deadline:
+                if ocd_p.poll() != None:
                     return
                 try:
-                    listener.connect(("127.0.0.1", 9999))
-                    logging.debug("Connecting to OpenOCD, attempt {}.".format(i))
+                    listener = socket.create_connection(("127.0.0.1", 9999), timeout=1)
                     break
-                except ConnectionRefusedError:
-                    if i == MAX_TRIES - 1:
-                        raise
+                except OSError:
+                    time.sleep(0.05)
+            if listener == None:
+                raise TockLoaderException("Could not connect to OpenOCD RTT server")
+            listener.settimeout(None)
 
             cleanup.append(listener.close)
             logging.status("Listening for messages.")
 
-            out = listener.makefile(mode="rb")
-            cleanup.append(out.close)
-            for out_line in iter(out.readline, ""):
-                l = out_line.decode("utf-8", errors="replace")
-                if not l.startswith("###RTT Client: *"):
-                    print(l, end="")
+            # Read whatever has arrived and print it a line at a time. The
+            # socket returns an empty read once OpenOCD closes it.
+            buf = bytearray()
+            while True:
+                data = listener.recv(4096)
+                if not data:
+                    break
+                buf.extend(data)
+                start = 0
+                end = buf.find(b"\n") + 1
+                while end > 0:
+                    if not buf.startswith(b"###RTT Client: *", start):
+                        print(buf[start:end].decode("utf-8", errors="replace"), end="")
+                    start = end
+                    end = buf.find(b"\n", start) + 1
+                del buf[:start]
         finally:
             logging.status("Stopping")
             for f in reversed(cleanup):
                 f()
 
-            openocd_command, _ = self._gather_openocd_cmdline(
+            openocd_args, _ = self._gather_openocd_cmdline(
                 [
                     "init",
                     "reset halt",
@@ -454,7 +884,7 @@ You may need to update OpenOCD to the version in latest git master."
                 None,
             )
             subprocess.run(
-                shlex.split(openocd_command),
+                openocd_args,
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
             )
@@ -2,22 +2,21 @@
 Interface for boards using STLink.
 """
 
+import collections
 import logging
-import platform
 import shlex
 import socket
 import subprocess
-import tempfile
 import time
 
 from .board_interface import BoardInterface
 from .exceptions import TockLoaderException
 
-# global static variable for collecting temp files for Windows
-collect_temp_files = []
-
 
 class STLink(BoardInterface):
+    # How many lines of st-flash output to keep for error messages.
+    OUTPUT_CONTEXT_LINES = 200
+
     def __init__(self, args):
         # Must call the generic init first.
         super().__init__(args)
@@ -26,6 +25,10 @@ class STLink(BoardInterface):
         self.stinfo_cmd = getattr(self.args, "stinfo_cmd")
         self.stflash_cmd = getattr(self.args, "stflash_cmd")
 
+        # Cached list of attached boards, `None` until we have asked st-info
+        # for it.
+        self.emulators = None
+
     def attached_board_exists(self):
         # Get a list of attached devices, check if that list has at least
         # one entry.
@@ -62,69 +65,62 @@ class STLink(BoardInterface):
           to false if the command will read bits from the board.
         """
 
-        # in Windows, you can't mark delete bc they delete too fast
-        delete = platform.system() != "Windows"
-        if self.args.debug:
-            delete = False
-
         if binary or not write:
-            temp_bin = tempfile.NamedTemporaryFile(
-                mode="w+b", suffix=".bin", delete=delete
-            )
+            # Use the same file every time, see `_get_scratch_file()`.
+            temp_bin = self._get_scratch_file(0)
+            temp_bin.seek(0)
+            temp_bin.truncate()
             if write:
                 temp_bin.write(binary)
 
             temp_bin.flush()
 
-            if platform.system() == "Windows":
-                # For Windows, forward slashes need to be escaped
-                temp_bin.name = temp_bin.name.replace("\\", "\\\\\\")
-                # For Windows, files need to be manually deleted
-                global collect_temp_files
-                collect_temp_files += [temp_bin.name]
-
-            # Update the command with the name of the binary file
-            command = command.format(binary=temp_bin.name)
+            binary_name = temp_bin.name
         else:
             temp_bin = None
+            binary_name = None
 
-        return (
-            "{stflash_cmd} --connect-under-reset {cmd}".format(
-                stflash_cmd=self.stflash_cmd,
-                cmd=command,
-            ),
-            temp_bin,
-        )
+        # Build the arguments directly, so the file name goes to st-flash as
+        # it is, whatever characters it has in it.
+        stlink_args = shlex.split(self.stflash_cmd) + ["--connect-under-reset"]
+        stlink_args += [arg.format(binary=binary_name) for arg in command.split()]
 
-    def _run_stlink_command(self, command, binary, write=True):
-        stlink_command, temp_bin = self._gather_stlink_cmdline(command, binary, write)
-
-        logging.debug('Running "{}".'.format(stlink_command.replace("$", "\$")))
+        return (stlink_args, temp_bin)
 
-        def print_output(subp):
-            response = ""
-            if subp.stdout:
-                response += subp.stdout.decode("utf-8")
-            if subp.stderr:
-                response += subp.stderr.decode("utf-8")
-            logging.info(response)
-            return response
+    def _run_stlink_command(self, command, binary, write=True):
+        stlink_args, temp_bin = self._gather_stlink_cmdline(command, binary, write)
+
+        logging.debug('Running "{}".'.format(self._format_cmdline(stlink_args)))
+
+        # st-flash prints progress as it writes, so handle its output as
+        # it arrives rather than collecting all of it. We only keep the
+        # end of it to show if something goes wrong.
+        output = collections.deque(maxlen=self.OUTPUT_CONTEXT_LINES)
+        no_device = False
+        with subprocess.Popen(
+            stlink_args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        ) as p:
+            for line in p.stdout:
+                output.append(line)
+                if self.args.debug:
+                    logging.info(line.decode("utf-8", errors="replace").rstrip())
+
+                # check that there was a JTAG programmer and that it found
+                # a device
+                if b"Couldn't find any ST-Link devices" in line:
+                    no_device = True
 
-        p = subprocess.run(
-            shlex.split(stlink_command), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
         if p.returncode != 0:
             logging.error(
                 "ERROR: st-flash returned with error code " + str(p.returncode)
             )
-            out = print_output(p)
+            if not self.args.debug:
+                logging.info(b"".join(output).decode("utf-8", errors="replace"))
             raise TockLoaderException("st-flash error")
-        elif self.args.debug:
-            print_output(p)
 
-        # check that there was a JTAG programmer and that it found a device
-        stdout = p.stdout.decode("utf-8")
-        if "Couldn't find any ST-Link devices" in stdout:
+        if no_device:
             raise TockLoaderException("ERROR: Cannot find hardware. Is USB attached?")
 
         if write == False:
@@ -135,10 +131,17 @@ class STLink(BoardInterface):
     def _list_emulators(self):
         """
         Return a list of board names that are attached to the host.
+
+        The attached boards will not change while tockloader is running, so
+        st-info is only run once.
         """
-        stlink_command = "{stinfo_cmd} --descr --connect-under-reset".format(
-            stinfo_cmd=self.stinfo_cmd
-        )
+        if self.emulators != None:
+            return self.emulators
+
+        stlink_args = shlex.split(self.stinfo_cmd) + [
+            "--descr",
+            "--connect-under-reset",
+        ]
 
         # These are the magic strings in the output of st-info we are looking
         # for.
@@ -158,9 +161,9 @@ class STLink(BoardInterface):
             return response
 
         try:
-            logging.debug('Running "{}".'.format(stlink_command))
+            logging.debug('Running "{}".'.format(self._format_cmdline(stlink_args)))
             p = subprocess.run(
-                shlex.split(stlink_command),
+                stlink_args,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
             )
@@ -181,12 +184,15 @@ class STLink(BoardInterface):
             # Any other error just ignore...this is only for convenience.
             pass
 
+        self.emulators = emulators
         return emulators
 
     def flash_binary(self, address, binary, pad=False):
         """
         Write using st-flash `write` command.
         """
+        self._invalidate_bootloader_region(address, len(binary))
+
         # st-flash write command
         command = "write {{binary}} {address:#x}"
 
@@ -226,6 +232,12 @@ class STLink(BoardInterface):
         binary = bytes([0xFF] * 8)
         self.flash_binary(address, binary)
 
+    def exit_bootloader_mode(self):
+        """
+        Clean up now that we are done with the board.
+        """
+        self._remove_scratch_files()
+
     def determine_current_board(self):
         if self.board and self.arch and self.page_size > 0:
             # These are already set! Yay we are done.
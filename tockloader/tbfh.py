@@ -189,8 +189,7 @@ class TBFTLVWriteableFlashRegions(TBFTLV):
 
         # Must be a multiple of 8 bytes
         if len(buffer) > 0 and len(buffer) % 8 == 0:
-            for i in range(0, int(len(buffer) / 8)):
-                base = struct.unpack("<II", buffer[i * 8 : (i + 1) * 8])
+            for base in struct.iter_unpack("<II", buffer):
                 # Add offset,length.
                 self.writeable_flash_regions.append((base[0], base[1]))
             self.valid = True
@@ -251,12 +250,19 @@ class TBFTLVPackageName(TBFTLV):
         self.valid = True
 
         if len(buffer) > 0:
-            self.package_name = buffer.decode("utf-8")
+            # Keep the name bytes as they are so `pack()` writes back a TLV of
+            # the same length.
+            self.encoded_name = bytes(buffer)
         else:
-            self.package_name = parameters[0]
+            self.encoded_name = parameters[0].encode("utf-8")
+
+        # Some tools include NUL padding in the TLV length, so strip that off
+        # the name we show. Don't fail on a corrupted name, show what we can
+        # instead.
+        self.package_name = self.encoded_name.rstrip(b"\x00").decode("utf-8", "replace")
 
     def pack(self):
-        encoded_name = self.package_name.encode("utf-8")
+        encoded_name = self.encoded_name
         out = struct.pack("<HH", self.TLVID, len(encoded_name))
         out += encoded_name
         # May need to add padding.
@@ -399,15 +405,13 @@ class TBFTLVPermissions(TBFTLV):
 
             # Each permission structure is 16 bytes
             if len(buffer) == num_permissions * 16:
-                while len(buffer) > 0:
-                    perm = struct.unpack("<IIQ", buffer[0:16])
+                for perm in struct.iter_unpack("<IIQ", buffer):
                     permission = {
                         "driver_number": perm[0],
                         "offset": perm[1],
                         "allowed_commands": perm[2],
                     }
                     self.permissions.append(permission)
-                    buffer = buffer[16:]
                     self.valid = True
         else:
             try:
@@ -761,6 +765,13 @@ class TBFHeader:
     return various properties of the application.
     """
 
+    # Layouts of the fixed fields in TBF headers. These are parsed for every
+    # header tockloader reads, so only compile the formats once.
+    VERSION_STRUCT = struct.Struct("<H")
+    BASE_V1_STRUCT = struct.Struct("<IIIIIIIIIIIIIIIIII")
+    BASE_V2_STRUCT = struct.Struct("<HIII")
+    TLV_HEADER_STRUCT = struct.Struct("<HH")
+
     def __init__(self, buffer):
         # Flag that records if this TBF header is valid. This is calculated once
         # when a new TBF header is read in. Any manipulations that tockloader
@@ -790,13 +801,13 @@ class TBFHeader:
             return
 
         # Get the version number
-        self.version = struct.unpack("<H", buffer[0:2])[0]
+        self.version = self.VERSION_STRUCT.unpack_from(buffer, 0)[0]
         buffer = buffer[2:]
 
         if self.version == 1 and len(buffer) >= 74:
             checksum = self._checksum(full_buffer[0:72])
             buffer = buffer[2:]
-            base = struct.unpack("<IIIIIIIIIIIIIIIIII", buffer[0:72])
+            base = self.BASE_V1_STRUCT.unpack_from(buffer, 0)
             buffer = buffer[72:]
             self.fields["total_size"] = base[0]
             self.fields["entry_offset"] = base[1]
@@ -822,7 +833,7 @@ class TBFHeader:
                 self.valid = True
 
         elif self.version == 2 and len(buffer) >= 14:
-            base = struct.unpack("<HIII", buffer[0:14])
+            base = self.BASE_V2_STRUCT.unpack_from(buffer, 0)
             buffer = buffer[14:]
             self.fields["header_size"] = base[0]
             self.fields["total_size"] = base[1]
@@ -847,7 +858,7 @@ class TBFHeader:
                     self.app = True
 
                     while remaining >= 4:
-                        base = struct.unpack("<HH", buffer[0:4])
+                        base = self.TLV_HEADER_STRUCT.unpack_from(buffer, 0)
                         buffer = buffer[4:]
                         tipe = base[0]
                         length = base[1]
@@ -1368,12 +1379,12 @@ class TBFHeader:
         padding = len(buffer) % 4
         if padding != 0:
             padding = 4 - padding
-            buffer += bytes([0] * padding)
+            buffer += bytes(padding)
 
-        # Loop throw
+        # Loop through each word
         checksum = 0
-        for i in range(0, len(buffer), 4):
-            checksum ^= struct.unpack("<I", buffer[i : i + 4])[0]
+        for (word,) in struct.iter_unpack("<I", buffer):
+            checksum ^= word
 
         return checksum
 
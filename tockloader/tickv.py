@@ -18,6 +18,14 @@ from .exceptions import TockLoaderException
 # know what string created it.
 MAGIC_INIT_HASHED_KEY = 0x7BC9F7FF4F76F244
 
+# CRC function used for TicKV object checksums. Building the CRC table is not
+# free, so this is done once rather than for every object. These arguments
+# don't exactly match (init should be 0), but the actual CRC values seem to
+# work.
+TICKV_CRC = crcmod.mkCrcFun(
+    poly=0x104C11DB7, rev=False, initCrc=0xFFFFFFFF, xorOut=0xFFFFFFFF
+)
+
 
 class TicKVObjectHeader:
     """
@@ -79,12 +87,6 @@ class TicKVObjectBase:
         self.header = header
         self.checksum = checksum
 
-        # These arguments don't exactly match (init should be 0), but the actual
-        # CRC values seem to work.
-        self.crc_fn = crcmod.mkCrcFun(
-            poly=0x104C11DB7, rev=False, initCrc=0xFFFFFFFF, xorOut=0xFFFFFFFF
-        )
-
     def length(self):
         """
         Return the total length of this object in the database in bytes.
@@ -117,7 +119,7 @@ class TicKVObjectBase:
         return object_bytes + checksum_bytes
 
     def _calculate_checksum(self, object_bytes):
-        return self.crc_fn(object_bytes)
+        return TICKV_CRC(object_bytes)
 
     def _get_object_bytes(self):
         main_bytes = self.get_value_bytes()
@@ -11,8 +11,6 @@ import ctypes
 import functools
 import itertools
 import logging
-import os
-import platform
 import textwrap
 import time
 
@@ -29,7 +27,7 @@ from .kernel_attributes import KernelAttributes
 from .tbfh import TBFHeader
 from .tbfh import TBFFooter
 from .jlinkexe import JLinkExe
-from .openocd import OpenOCD, collect_temp_files
+from .openocd import OpenOCD
 from .stlink import STLink
 from .flash_file import FlashFile
 from .tickv import TockTicKV
@@ -285,8 +283,7 @@ class TockLoader:
             # Check if we should add padding, which is just pad[0] copies of the
             # same byte (pad[1]).
             if pad:
-                extra = bytes([pad[1]] * pad[0])
-                binary = binary + extra
+                binary = binary + bytes([pad[1]]) * pad[0]
 
             self.channel.flash_binary(address, binary)
 
@@ -502,8 +499,9 @@ class TockLoader:
 
             if len(remove_apps) > 0:
                 # Uninstall apps by replacing them all with padding.
-                for remove_app in remove_apps:
-                    self._replace_with_padding(remove_app)
+                with self.channel.batch():
+                    for remove_app in remove_apps:
+                        self._replace_with_padding(remove_app)
 
                 logging.status("Uninstall complete.")
 
@@ -928,10 +926,6 @@ class TockLoader:
 
             yield
 
-            if platform.system() == "Windows":
-                for file in collect_temp_files:
-                    os.remove(file)
-
             now = time.time()
             logging.info("Finished in {:0.3f} seconds".format(now - then))
         except Exception as e:
@@ -944,21 +938,10 @@ class TockLoader:
         Check if a bootloader exists on this board. It is specified by the
         string "TOCKBOOTLOADER" being at address 0x400.
         """
-        # Check to see if the channel already knows this. For example,
-        # if you are connected via a serial link to the bootloader,
-        # then obviously the bootloader is present.
-        if self.channel.bootloader_is_present() == True:
-            return True
-
-        # Otherwise check for the bootloader flag in the flash.
-
-        # Constants for the bootloader flag
-        address = 0x400
-        length = 14
-        flag = self.channel.read_range(address, length)
-        flag_str = flag.decode("utf-8", "ignore")
-        logging.debug("Read from flags location: {}".format(flag_str))
-        return flag_str == "TOCKBOOTLOADER"
+        # The channel knows best. For example, if you are connected via a
+        # serial link to the bootloader, then obviously the bootloader is
+        # present. Otherwise it checks for the flag in flash.
+        return self.channel.bootloader_is_present()
 
     def _update_board_specific_options(self):
         """
@@ -1108,7 +1091,7 @@ class TockLoader:
         out = bytes([])
         # Add key
         out += key.encode("utf-8")
-        out += bytes([0] * (8 - len(out)))
+        out += bytes(8 - len(out))
         # Add length
         out += bytes([len(value.encode("utf-8"))])
         # Add value
@@ -1413,41 +1396,42 @@ class TockLoader:
             for l in app_layout.splitlines():
                 logging.info(l)
 
-            # Actually write apps to the board.
-            app_address = address
-            if self.args.bundle_apps:
-                # Tockloader has been configured to bundle all apps as a single
-                # binary. Here we concatenate all apps and then call flash once.
-                #
-                # This should be compatible with all boards, but if there
-                # several existing apps they have to be re-flashed, and that
-                # could add significant overhead. So, we prefer to flash only
-                # what has changed and special case this bundle operation.
-                app_bundle = bytearray()
-                for app in to_flash_apps:
-                    app_bundle += app.get_binary(app_address)
-                    app_address += app.get_size()
-                logging.info(
-                    "Installing app bundle. Size: {} bytes.".format(len(app_bundle))
-                )
-                self.channel.flash_binary(address, app_bundle)
-            else:
-                # Flash only apps that have been modified. The only way an app
-                # would not be modified is if it was read off the board and
-                # nothing changed.
-                for app in to_flash_apps:
-                    # If we get a binary, then we need to flash it. Otherwise,
-                    # the app is already installed.
-                    optional_binary = app.get_binary(app_address)
-                    if optional_binary:
-                        self.channel.flash_binary(app_address, optional_binary)
-                    app_address = app_address + app.get_size()
-
-            # Then erase the next page if we have not already rewritten all
-            # existing apps. This ensures that flash is clean at the end of the
-            # installed apps and makes sure the kernel will find the correct end
-            # of applications.
-            self.channel.clear_bytes(app_address)
+            with self.channel.batch():
+                # Actually write apps to the board.
+                app_address = address
+                if self.args.bundle_apps:
+                    # Tockloader has been configured to bundle all apps as a single
+                    # binary. Here we concatenate all apps and then call flash once.
+                    #
+                    # This should be compatible with all boards, but if there
+                    # several existing apps they have to be re-flashed, and that
+                    # could add significant overhead. So, we prefer to flash only
+                    # what has changed and special case this bundle operation.
+                    app_bundle = bytearray()
+                    for app in to_flash_apps:
+                        app_bundle += app.get_binary(app_address)
+                        app_address += app.get_size()
+                    logging.info(
+                        "Installing app bundle. Size: {} bytes.".format(len(app_bundle))
+                    )
+                    self.channel.flash_binary(address, app_bundle)
+                else:
+                    # Flash only apps that have been modified. The only way an app
+                    # would not be modified is if it was read off the board and
+                    # nothing changed.
+                    for app in to_flash_apps:
+                        # If we get a binary, then we need to flash it. Otherwise,
+                        # the app is already installed.
+                        optional_binary = app.get_binary(app_address)
+                        if optional_binary:
+                            self.channel.flash_binary(app_address, optional_binary)
+                        app_address = app_address + app.get_size()
+
+                # Then erase the next page if we have not already rewritten all
+                # existing apps. This ensures that flash is clean at the end of the
+                # installed apps and makes sure the kernel will find the correct end
+                # of applications.
+                self.channel.clear_bytes(app_address)
 
             # Handled fixed address case, do not continue on to run the
             # non-fixed address case.
@@ -1487,7 +1471,11 @@ class TockLoader:
         # apps and then re-write them, since otherwise they will be erased.
         #
         # So, we iterate through all apps and read them into memory if we are
-        # doing an erase and re-flash cycle or if the app has moved.
+        # doing an erase and re-flash cycle or if the app has moved. Apps that
+        # stay where they are and are unchanged are never read. Each app that
+        # is read is read whole, header and footers included, in a single
+        # `read_range()`, and the binary is kept on the app so it is not read
+        # again.
         app_address = address
         for app in apps:
             # If we do not already have a binary, and any of the conditions are
@@ -1507,80 +1495,81 @@ class TockLoader:
         # Need to know the address we are putting each app at.
         app_address = address
 
-        # Actually write apps to the board.
-        if self.args.bundle_apps:
-            # Tockloader has been configured to bundle all apps as a single
-            # binary. Here we concatenate all apps and then call flash once.
-            #
-            # This should be compatible with all boards, but if there several
-            # existing apps they have to be re-flashed, and that could add
-            # significant overhead. So, we prefer to flash only what has changed
-            # and special case this bundle operation.
-            app_bundle = bytearray()
-            for app in apps:
-                # Check if we might need to insert a padding app.
-                if self.app_settings["alignment_constraint"]:
-                    if self.app_settings["alignment_constraint"] == "size":
-                        # We need to make sure the app is aligned to a multiple
-                        # of its size.
-                        size = app.get_size()
-                        multiple = app_address // size
-                        if multiple * size != app_address:
-                            # Not aligned. Insert padding app.
-                            new_address = ((app_address + size) // size) * size
-                            gap_size = new_address - app_address
-                            padding = PaddingApp(gap_size)
-                            app_bundle += padding
-                            app_address = new_address
-
-                app_bundle += app.get_binary(app_address)
-                app_address += app.get_size()
-
-            # Add blank at the end to make sure we clear the end of the list of
-            # apps.
-            app_bundle += bytes([0xFF] * 8)
-
-            logging.info(
-                "Installing app bundle. Size: {} bytes.".format(len(app_bundle))
-            )
-            self.channel.flash_binary(address, app_bundle)
-        else:
-            # Flash only apps that have been modified. The only way an app would
-            # not be modified is if it was read off the board and nothing
-            # changed.
-            for app in apps:
-                # Check if we might need to insert a padding app.
-                if self.app_settings["alignment_constraint"]:
-                    if self.app_settings["alignment_constraint"] == "size":
-                        # We need to make sure the app is aligned to a multiple
-                        # of its size.
-                        size = app.get_size()
-                        multiple = app_address // size
-                        if multiple * size != app_address:
-                            # Not aligned. Insert padding app.
-                            new_address = ((app_address + size) // size) * size
-                            gap_size = new_address - app_address
-                            padding = PaddingApp(gap_size)
-
-                            logging.info("Flashing padding to board.")
-                            self.channel.flash_binary(
-                                app_address, padding.get_binary(app_address)
-                            )
-                            app_address = new_address
-
-                # If we get a binary, then we need to flash it. Otherwise,
-                # the app is already installed.
-                optional_binary = app.get_binary(app_address)
-                if optional_binary:
-                    logging.info("Flashing app {} binary to board.".format(app))
-                    self.channel.flash_binary(app_address, optional_binary)
-                app_address = app_address + app.get_size()
-
-            # Then erase the next page if we have not already rewritten all
-            # existing apps. This ensures that flash is clean at the end of the
-            # installed apps and makes sure the kernel will find the correct end
-            # of applications.
-            self.channel.clear_bytes(app_address)
+        with self.channel.batch():
+            # Actually write apps to the board.
+            if self.args.bundle_apps:
+                # Tockloader has been configured to bundle all apps as a single
+                # binary. Here we concatenate all apps and then call flash once.
+                #
+                # This should be compatible with all boards, but if there several
+                # existing apps they have to be re-flashed, and that could add
+                # significant overhead. So, we prefer to flash only what has changed
+                # and special case this bundle operation.
+                app_bundle = bytearray()
+                for app in apps:
+                    # Check if we might need to insert a padding app.
+                    if self.app_settings["alignment_constraint"]:
+                        if self.app_settings["alignment_constraint"] == "size":
+                            # We need to make sure the app is aligned to a multiple
+                            # of its size.
+                            size = app.get_size()
+                            multiple = app_address // size
+                            if multiple * size != app_address:
+                                # Not aligned. Insert padding app.
+                                new_address = ((app_address + size) // size) * size
+                                gap_size = new_address - app_address
+                                padding = PaddingApp(gap_size)
+                                app_bundle += padding
+                                app_address = new_address
+
+                    app_bundle += app.get_binary(app_address)
+                    app_address += app.get_size()
+
+                # Add blank at the end to make sure we clear the end of the list of
+                # apps.
+                app_bundle += bytes([0xFF] * 8)
+
+                logging.info(
+                    "Installing app bundle. Size: {} bytes.".format(len(app_bundle))
+                )
+                self.channel.flash_binary(address, app_bundle)
+            else:
+                # Flash only apps that have been modified. The only way an app would
+                # not be modified is if it was read off the board and nothing
+                # changed.
+                for app in apps:
+                    # Check if we might need to insert a padding app.
+                    if self.app_settings["alignment_constraint"]:
+                        if self.app_settings["alignment_constraint"] == "size":
+                            # We need to make sure the app is aligned to a multiple
+                            # of its size.
+                            size = app.get_size()
+                            multiple = app_address // size
+                            if multiple * size != app_address:
+                                # Not aligned. Insert padding app.
+                                new_address = ((app_address + size) // size) * size
+                                gap_size = new_address - app_address
+                                padding = PaddingApp(gap_size)
+
+                                logging.info("Flashing padding to board.")
+                                self.channel.flash_binary(
+                                    app_address, padding.get_binary(app_address)
+                                )
+                                app_address = new_address
+
+                    # If we get a binary, then we need to flash it. Otherwise,
+                    # the app is already installed.
+                    optional_binary = app.get_binary(app_address)
+                    if optional_binary:
+                        logging.info("Flashing app {} binary to board.".format(app))
+                        self.channel.flash_binary(app_address, optional_binary)
+                    app_address = app_address + app.get_size()
+
+                # Then erase the next page if we have not already rewritten all
+                # existing apps. This ensures that flash is clean at the end of the
+                # installed apps and makes sure the kernel will find the correct end
+                # of applications.
+                self.channel.clear_bytes(app_address)
 
     def _replace_with_padding(self, app):
         """
@@ -1615,13 +1604,26 @@ class TockLoader:
         # the hardware, or it can be passed in to Tockloader.
         address = self._get_apps_start_address()
 
+        # How many bytes to read to get each app header.
+        header_length = 200  # Version 2
+
+        # The footer of an app ends right where the header of the next app
+        # starts. When we have to read a footer we also read the next header
+        # with it, and store that here so we don't read it again.
+        next_header = None
+
         # Jump through the linked list of apps
         while True:
-            header_length = 200  # Version 2
-            logging.debug(
-                "Reading for app header @{:#x}, {} bytes".format(address, header_length)
-            )
-            flash = self.channel.read_range(address, header_length)
+            if next_header != None and len(next_header) == header_length:
+                flash = next_header
+            else:
+                logging.debug(
+                    "Reading for app header @{:#x}, {} bytes".format(
+                        address, header_length
+                    )
+                )
+                flash = self.channel.read_range(address, header_length)
+            next_header = None
 
             # if there was an error, the binary array will be empty
             if len(flash) < header_length:
@@ -1636,25 +1638,55 @@ class TockLoader:
                     # and include it.
                     tbff = None
                     app_binary = None
-                    if tbfh.has_footer():
-                        footer_start = address + tbfh.get_binary_end_offset()
-                        footer_length = tbfh.get_footer_size()
+                    entire_app = None
+                    if extract_app_binary:
+                        # We need the whole app anyway, so read it all at once
+                        # rather than issuing separate reads for the binary and
+                        # the footer.
                         logging.debug(
-                            "Reading for app footer @{:#x}, {} bytes".format(
-                                footer_start, footer_length
+                            "Reading entire app @{:#x}, {} bytes".format(
+                                address, tbfh.get_app_size() + header_length
                             )
                         )
-                        flash = self.channel.read_range(footer_start, footer_length)
-                        tbff = TBFFooter(tbfh, None, flash)
-
-                    if extract_app_binary:
-                        app_binary_start = address + tbfh.get_header_size()
-                        app_binary_len = (
-                            tbfh.get_binary_end_offset() - tbfh.get_header_size()
-                        )
-                        app_binary = self.channel.read_range(
-                            app_binary_start, app_binary_len
+                        entire_app = self.channel.read_range(
+                            address, tbfh.get_app_size() + header_length
                         )
+                        next_header = entire_app[tbfh.get_app_size() :]
+                        if len(entire_app) < tbfh.get_app_size():
+                            entire_app = self.channel.read_range(
+                                address, tbfh.get_app_size()
+                            )
+                        app_binary = entire_app[
+                            tbfh.get_header_size() : tbfh.get_binary_end_offset()
+                        ]
+
+                    if tbfh.has_footer():
+                        footer_start = tbfh.get_binary_end_offset()
+                        footer_length = tbfh.get_footer_size()
+                        if entire_app:
+                            flash = entire_app[
+                                footer_start : footer_start + footer_length
+                            ]
+                        else:
+                            logging.debug(
+                                "Reading for app footer and next header @{:#x}, {} bytes".format(
+                                    address + footer_start,
+                                    footer_length + header_length,
+                                )
+                            )
+                            flash = self.channel.read_range(
+                                address + footer_start, footer_length + header_length
+                            )
+                            next_header = flash[footer_length:]
+                            flash = flash[:footer_length]
+
+                            # If the app is at the very end of flash, reading
+                            # past it may fail. Then just read the footer.
+                            if len(flash) < footer_length:
+                                flash = self.channel.read_range(
+                                    address + footer_start, footer_length
+                                )
+                        tbff = TBFFooter(tbfh, None, flash)
 
                     app = InstalledApp(tbfh, tbff, address, app_binary)
                     apps.append(app)
@@ -1779,27 +1811,31 @@ class TockLoader:
         Print information about a list of apps
         """
         if not quiet:
-            # Print info about each app
+            # Build the info about each app and print it all at once, rather
+            # than writing to the console for every line.
+            out = []
             for i, app in enumerate(apps):
                 if app.is_app():
-                    print(helpers.text_in_box("App {}".format(i), 52))
+                    out.append(helpers.text_in_box("App {}".format(i), 52))
 
                     # Check if this app is OK with the MPU region requirements.
                     if not self._app_is_aligned_correctly(
                         app.get_address(), app.get_size()
                     ):
-                        print("  [WARNING] App is misaligned for the MPU")
+                        out.append("  [WARNING] App is misaligned for the MPU")
 
-                    print(textwrap.indent(app.info(verbose), "  "))
-                    print("")
+                    out.append(textwrap.indent(app.info(verbose), "  "))
+                    out.append("")
                 else:
                     # Display padding
-                    print(helpers.text_in_box("Padding", 52))
-                    print(textwrap.indent(app.info(verbose), "  "))
-                    print("")
+                    out.append(helpers.text_in_box("Padding", 52))
+                    out.append(textwrap.indent(app.info(verbose), "  "))
+                    out.append("")
 
             if len(apps) == 0:
                 logging.info("No found apps.")
+            else:
+                print("\n".join(out))
 
         else:
             # In quiet mode just show the names.